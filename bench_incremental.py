@@ -0,0 +1,73 @@
+import argparse
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from psa_incremental import refresh_summary
+from psa_loader import SUMMARY_COLUMNS, compact_psa_frame
+from psa_summary import rollup_metrics, FINAL_SUMMARY_METRICS, DASHBOARD_METRICS
+from psa_synthetic import generate_psa_frame
+
+# Full recompute vs incremental refresh on synthetic data with the PSA
+# schema: a cold refresh (no state), a refresh with nothing changed, and one
+# where a single Month's rows changed.
+
+WORKLOADS = [
+    ("final_summary", ["Affiliate", "DIV_NAME"], FINAL_SUMMARY_METRICS),
+    ("dashboard", ["Tag", "Affiliate", "DIV_NAME", "Month"], DASHBOARD_METRICS),
+]
+
+
+def _timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def _change_one_month(df, seed):
+    """
+    Copy of df with the flags of one Month's rows redrawn
+    """
+    changed = df.copy()
+    month = changed["Month"].dropna().iloc[0]
+    rows = (changed["Month"] == month).to_numpy()
+    rng = np.random.default_rng(seed)
+    for col in ["Is PSA Created", "PSA Activity Executed"]:
+        changed.loc[rows, col] = rng.integers(0, 2, size=int(rows.sum())).astype(changed[col].dtype)
+    return changed, month
+
+
+def run_benchmark(rows, seed=0):
+    print(f"🧪 Generating {rows:,} synthetic rows (seed {seed})...")
+    df = compact_psa_frame(generate_psa_frame(rows, seed=seed, columns=SUMMARY_COLUMNS))
+    changed, month = _change_one_month(df, seed)
+    print(f"🗓️ {df['Month'].nunique()} Month partitions; the changed one is {month}")
+
+    state_dir = tempfile.mkdtemp(prefix="psa_state_")
+    try:
+        for name, keys, metrics in WORKLOADS:
+            sets = [keys, []]
+            full_time, _ = _timed(lambda: rollup_metrics(df, keys, metrics, sets))
+            _, expected = _timed(lambda: rollup_metrics(changed, keys, metrics, sets))
+            print(f"\n📊 {name} ({' × '.join(keys)})")
+            print(f"   full rollup_metrics   {full_time:8.3f}s")
+            steps = [("cold refresh", df), ("nothing changed", df), ("one Month changed", changed)]
+            for label, frame in steps:
+                elapsed, (result, stats) = _timed(
+                    lambda: refresh_summary(frame, keys, metrics, sets, state_dir=state_dir, name=name))
+                print(f"   {label:<21} {elapsed:8.3f}s  speedup {full_time / elapsed:5.2f}x"
+                      f"  ({len(stats['recomputed'])} recomputed, {len(stats['reused'])} reused)")
+            same = all(a.equals(b) for a, b in zip(result, expected))
+            print("   ✅ matches a full recompute" if same else "   ❌ result differs from a full recompute")
+    finally:
+        shutil.rmtree(state_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark incremental PSA refresh on synthetic data.")
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run_benchmark(args.rows, args.seed)
@@ -0,0 +1,84 @@
+import argparse
+import os
+import tempfile
+import time
+
+import psa_trace
+from psa_loader import SUMMARY_COLUMNS, compact_psa_frame
+from psa_parallel import parallel_rollup_metrics
+from psa_summary import rollup_metrics, FINAL_SUMMARY_METRICS, DASHBOARD_METRICS
+from psa_synthetic import generate_psa_frame
+
+# Serial vs process-pool aggregation on synthetic data with the PSA schema,
+# running both scripts' metric sets. The parallel engine's stages are traced
+# to report its serial fraction: the share of the run spent in the parent
+# (encoding, merging, rolling up) rather than in the pool.
+
+WORKLOADS = [
+    ("final_summary", ["Affiliate", "DIV_NAME"], FINAL_SUMMARY_METRICS),
+    ("dashboard", ["Tag", "Affiliate", "DIV_NAME", "Month"], DASHBOARD_METRICS),
+]
+
+
+def _best_of(repeat, func):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def _best_traced(repeat, tracer, func):
+    """
+    _best_of() keeping the best run's stage timings from the trace
+    """
+    best, result, stages = None, None, {}
+    for _ in range(repeat):
+        del tracer.records[:]
+        elapsed, result = _best_of(1, func)
+        if best is None or elapsed < best:
+            best, stages = elapsed, {record["stage"]: record["wall_seconds"] for record in tracer.records}
+    return best, result, stages
+
+
+def run_benchmark(rows, worker_counts, repeat=1, seed=0, compact=False, trace=None):
+    print(f"🧪 Generating {rows:,} synthetic rows (seed {seed})...")
+    df = generate_psa_frame(rows, seed=seed, columns=SUMMARY_COLUMNS)
+    if compact:
+        df = compact_psa_frame(df)
+    print(f"🖥️ {os.cpu_count()} CPU(s) available")
+    tracer = psa_trace.start_tracing(trace or os.path.join(tempfile.gettempdir(), "bench_parallel.trace.json"),
+                                     profile=[])
+
+    for name, keys, metrics in WORKLOADS:
+        sets = [keys, []]
+        serial_time, expected = _best_of(repeat, lambda: rollup_metrics(df, keys, metrics, sets))
+        print(f"\n📊 {name} ({' × '.join(keys)})")
+        print(f"   serial      {serial_time:8.3f}s")
+        for workers in worker_counts:
+            elapsed, result, stages = _best_traced(
+                repeat, tracer, lambda: parallel_rollup_metrics(df, keys, metrics, sets, workers=workers))
+            # Everything outside the pool runs in the parent, one process
+            serial = elapsed - stages.get("parallel_workers", 0.0)
+            same = all(a.equals(b) for a, b in zip(result, expected))
+            print(f"   {workers:2d} worker(s) {elapsed:8.3f}s  speedup {serial_time / elapsed:5.2f}x"
+                  f"  serial fraction {serial / elapsed:5.1%}"
+                  f" (encode {stages.get('parallel_encode', 0.0):.3f}s, merge {stages.get('parallel_merge', 0.0):.3f}s)"
+                  f"{'' if same else '  ❌ result differs from serial'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark parallel PSA aggregation on synthetic data.")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--workers", default="1,2,4,8",
+                        help="Comma-separated worker counts to time (default: 1,2,4,8)")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per timing; the best is kept")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--compact", action="store_true",
+                        help="Use the compact (categorical) frame the report scripts load")
+    parser.add_argument("--trace", help="Trace file for the parallel stages (default: in the temp directory)")
+    args = parser.parse_args()
+    run_benchmark(args.rows, [int(w) for w in args.workers.split(",")], args.repeat, args.seed, args.compact,
+                  args.trace)
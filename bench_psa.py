@@ -0,0 +1,247 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import runpy
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+import psa_trace
+from ctcg import create_interactive_dashboard
+from psa_loader import load_psa_data
+from psa_synthetic import write_psa_dataset, EXCEL_MAX_ROWS
+
+# Benchmark suite: runs fdrf.py and ctcg.py themselves on seeded synthetic
+# datasets under psa_trace and writes the timings of their stages as JSON, so
+# what is measured is what the scripts do. Each case runs in its own process
+# so its peak RSS is its own.
+
+DATA_DIR = ".psa_bench"
+RESULTS_DIR = "bench_results"
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000, 10_000_000]
+FORMATS = ["csv", "xlsx"]
+PIPELINES = ["final_summary", "dashboard"]
+FDRF_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fdrf.py")
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+def dataset_path(data_dir, fmt, rows, seed):
+    """
+    Generate the synthetic dataset for a case once and reuse it afterwards
+    """
+    path = os.path.join(data_dir, f"psa_{rows}_{seed}.{fmt}")
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        print(f"🧪 Generating {path}...", file=sys.stderr)
+        write_psa_dataset(path, rows, seed=seed)
+    return path
+
+
+def _run_traced(pipeline, workdir):
+    """
+    Run a pipeline's entry point under psa_trace in workdir, where its caches
+    and output go, and return its stage records; its console output is
+    dropped unless it exits with an error
+    """
+    tracer = psa_trace.start_tracing(os.path.join(workdir, "trace.json"), profile=[])
+    output = io.StringIO()
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        with contextlib.redirect_stdout(output):
+            try:
+                pipeline()
+            finally:
+                psa_trace.finish_tracing()
+    except SystemExit:
+        lines = output.getvalue().strip().splitlines()
+        raise RuntimeError(lines[-1] if lines else "the pipeline exited") from None
+    finally:
+        os.chdir(cwd)
+    return tracer.records
+
+
+def _final_summary(path):
+    """
+    (prime, run): fdrf.py as a user runs it, on path, without the build
+    cache; it is cheap enough to prime the columnar cache by running it whole
+    """
+    os.environ["PSA_DATABASE"] = path
+    os.environ["PSA_BUILD_CACHE"] = "0"
+    run = lambda: runpy.run_path(FDRF_SCRIPT)
+    return run, run
+
+
+def _dashboard(path):
+    """
+    (prime, run): ctcg.py in streaming mode, without the build cache, primed
+    by the load it makes rather than by writing the workbook twice
+    """
+    def prime():
+        with psa_trace.stage("load"):
+            load_psa_data(path, compact=True)
+    return prime, lambda: create_interactive_dashboard(path, "dashboard.xlsx", streaming=True, build_cache=False)
+
+
+def _stages(records):
+    stages = {}
+    for record in records:
+        stage = stages.setdefault(record["stage"], {"seconds": 0.0, "rows": record["rows"]})
+        stage["seconds"] = round(stage["seconds"] + record["wall_seconds"], 4)
+        stage["rss_mb"] = record["rss_mb"]
+    return stages
+
+
+def run_case(pipeline, fmt, rows, seed, data_dir):
+    """
+    Run one pipeline on one dataset in this process and return its record.
+    Priming parses the source into the columnar cache and gives the ingest
+    time; the run that follows, loading from the cache, is the one timed
+    stage by stage.
+    """
+    path = os.path.abspath(dataset_path(data_dir, fmt, rows, seed))
+    prime, run = _final_summary(path) if pipeline == "final_summary" else _dashboard(path)
+    start_rss = _peak_rss_mb()
+    with tempfile.TemporaryDirectory() as workdir:
+        cold = _stages(_run_traced(prime, workdir))
+        start = time.perf_counter()
+        stages = _stages(_run_traced(run, workdir))
+        total = time.perf_counter() - start
+    stages = dict({"ingest": cold["load"]}, **stages)
+    n_rows = stages["load"]["rows"]
+    return {"pipeline": pipeline, "format": fmt, "rows": n_rows, "stages": stages,
+            "total_seconds": round(total, 4), "rows_per_second": round(n_rows / total) if total else None,
+            "start_rss_mb": round(start_rss, 1), "peak_rss_mb": round(_peak_rss_mb(), 1)}
+
+
+def _case_in_subprocess(pipeline, fmt, rows, seed, data_dir):
+    command = [sys.executable, os.path.abspath(__file__), "--run-case", pipeline, fmt, str(rows),
+               "--seed", str(seed), "--data-dir", data_dir]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        error = completed.stderr.strip().splitlines()[-1:] or [f"exit code {completed.returncode}"]
+        return {"pipeline": pipeline, "format": fmt, "rows": rows, "error": error[0]}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def _environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True,
+                                    cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip())
+    except OSError:
+        commit, dirty = None, None
+    return {"commit": commit, "dirty": dirty, "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(), "pandas": pd.__version__, "numpy": np.__version__,
+            "openpyxl": openpyxl.__version__, "platform": platform.platform(), "cpus": os.cpu_count()}
+
+
+def run_suite(sizes, formats, pipelines, seed=0, data_dir=DATA_DIR, output=None):
+    results = {"environment": _environment(), "seed": seed, "cases": []}
+    for rows in sizes:
+        for fmt in formats:
+            for pipeline in pipelines:
+                if fmt == "xlsx" and rows >= EXCEL_MAX_ROWS:
+                    record = {"pipeline": pipeline, "format": fmt, "rows": rows,
+                              "skipped": "larger than an Excel sheet"}
+                elif pipeline == "dashboard" and rows >= EXCEL_MAX_ROWS:
+                    # ctcg.py copies every row to the SourceData sheet
+                    record = {"pipeline": pipeline, "format": fmt, "rows": rows,
+                              "skipped": "SourceData would not fit on an Excel sheet"}
+                else:
+                    print(f"⏱️ {pipeline} on {rows:,} {fmt} rows...")
+                    record = _case_in_subprocess(pipeline, fmt, rows, seed, data_dir)
+                results["cases"].append(record)
+                if "stages" in record:
+                    timings = ", ".join(f"{name} {stage['seconds']:.2f}s" for name, stage in record["stages"].items())
+                    print(f"   {timings} | peak RSS {record['peak_rss_mb']:.0f} MB")
+                else:
+                    print(f"   ⚠️ {record.get('error') or record.get('skipped')}")
+
+    if output is None:
+        commit = results["environment"]["commit"] or "nocommit"
+        output = os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"✅ Results written → {os.path.abspath(output)}")
+    return results
+
+
+def compare_results(baseline_file, current_file, threshold=0.2, min_seconds=0.25):
+    """
+    Print per-stage time ratios between two result files and return the
+    stages that got slower by more than threshold (0.2 = 20%). Stages under
+    min_seconds in both runs are shown but never counted, being mostly noise.
+    """
+    with open(baseline_file, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(current_file, encoding="utf-8") as f:
+        current = json.load(f)
+    old_cases = {(c["pipeline"], c["format"], c["rows"]): c for c in baseline["cases"] if "stages" in c}
+    regressions = []
+    print(f"📊 {baseline['environment']['commit']} → {current['environment']['commit']}")
+    for case in current["cases"]:
+        key = (case["pipeline"], case["format"], case["rows"])
+        if "stages" not in case or key not in old_cases:
+            continue
+        print(f"\n{case['pipeline']} / {case['format']} / {case['rows']:,} rows")
+        for name, stage in case["stages"].items():
+            old = old_cases[key]["stages"].get(name)
+            if old is None:
+                continue
+            ratio = stage["seconds"] / old["seconds"] if old["seconds"] else float("inf")
+            slower = ratio > 1 + threshold and max(stage["seconds"], old["seconds"]) >= min_seconds
+            if slower:
+                regressions.append((key, name, ratio))
+            print(f"   {name:<18} {old['seconds']:9.3f}s → {stage['seconds']:9.3f}s  {ratio:5.2f}x"
+                  f"{'  ❌ slower' if slower else ''}")
+        old_peak = old_cases[key]["peak_rss_mb"]
+        print(f"   {'peak RSS':<18} {old_peak:8.0f}MB → {case['peak_rss_mb']:8.0f}MB")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the PSA report pipelines on synthetic data.")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES),
+                        help="comma-separated row counts (default: 10k, 100k, 1M, 10M)")
+    parser.add_argument("--formats", default=",".join(FORMATS), help="csv, xlsx or both")
+    parser.add_argument("--pipelines", default=",".join(PIPELINES), help="final_summary, dashboard or both")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default=DATA_DIR, help="where generated datasets are kept")
+    parser.add_argument("--output", help="results file (default: bench_results/<time>-<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"),
+                        help="compare two results files instead of running; exits 1 on a regression")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="slowdown ratio counted as a regression by --compare (default 0.2)")
+    parser.add_argument("--min-seconds", type=float, default=0.25,
+                        help="stages faster than this in both runs are never counted as regressions")
+    parser.add_argument("--run-case", nargs=3, metavar=("PIPELINE", "FORMAT", "ROWS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        pipeline, fmt, rows = args.run_case
+        print(json.dumps(run_case(pipeline, fmt, int(rows), args.seed, args.data_dir)))
+    elif args.compare:
+        sys.exit(1 if compare_results(*args.compare, threshold=args.threshold,
+                                      min_seconds=args.min_seconds) else 0)
+    else:
+        run_suite([int(size) for size in args.sizes.split(",")], args.formats.split(","),
+                  args.pipelines.split(","), args.seed, args.data_dir, args.output)
@@ -1,36 +1,34 @@
-I'll create a fully interactive dashboard with proper column mapping and real Excel slicers. This will use pivot tables and slicers for true interactivity.
 import pandas as pd
 import openpyxl
-from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
+from copy import copy
+from openpyxl.styles import PatternFill, Font, Alignment, Border, Side, NamedStyle
+from openpyxl.styles.fonts import DEFAULT_FONT
 from openpyxl.utils import get_column_letter
 from openpyxl.worksheet.table import Table, TableStyleInfo
+from excel_writer import (write_dataframe_streaming, write_frames_streaming, dataframe_column_widths,
+                          apply_column_widths, copy_to_write_only, append_styled_rows, append_styled_table)
+from psa_loader import load_psa_data, iter_csv_chunks, describe_load
+from psa_summary import rollup_metrics, summarize_chunks, metric_columns, DASHBOARD_METRICS
+from psa_incremental import refresh_summary
+from psa_parallel import parallel_rollup_metrics
+from psa_cube import FilterCube, cube_grouping_sets
+from psa_build_cache import (source_digest, code_digest, build_key, load_aggregates, store_aggregates,
+                             restore_output, store_output, ENGINE_MODULES)
+import psa_trace
+import itertools
 import warnings
 warnings.filterwarnings('ignore')
 
-def create_interactive_dashboard(csv_file, output_file='PSA_Interactive_Dashboard.xlsx'):
+# Dimensions of SummaryData, which are also the keys the Dashboard can be filtered on
+SUMMARY_KEYS = ['Tag', 'Affiliate', 'DIV_NAME', 'Month']
+
+# Slice shown on the Dashboard sheet unless other filters are given
+DEFAULT_DASHBOARD_FILTERS = {'Affiliate': 'ASC', 'Month': "Aug'25", 'Tag': 'Outside of Project Shield'}
+
+def _write_source_data(ws_data, df, column_widths):
     """
-    Create an interactive dashboard with proper column mapping from PSA Database CSV file
+    Write the raw CSV rows into an in-memory SourceData sheet
     """
-    
-    # Read the CSV file
-    print("Reading CSV file...")
-    df = pd.read_csv(csv_file)
-    
-    print(f"Total records: {len(df)}")
-    print(f"Columns: {df.columns.tolist()}")
-    
-    # Create a new workbook
-    wb = openpyxl.Workbook()
-    
-    # Remove default sheet
-    if 'Sheet' in wb.sheetnames:
-        wb.remove(wb['Sheet'])
-    
-    # ========== CREATE DATA SHEET ==========
-    ws_data = wb.create_sheet('SourceData', 0)
-    
-    print("Writing source data...")
-    
     # Write headers
     for col_idx, col_name in enumerate(df.columns, start=1):
         cell = ws_data.cell(row=1, column=col_idx)
@@ -56,46 +54,191 @@ def create_interactive_dashboard(csv_file, output_file='PSA_Interactive_Dashboar
     ws_data.add_table(table)
     
     # Auto-fit columns
-    for column in ws_data.columns:
-        max_length = 0
-        column_letter = get_column_letter(column[0].column)
-        for cell in column:
-            try:
-                if cell.value:
-                    max_length = max(max_length, len(str(cell.value)))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws_data.column_dimensions[column_letter].width = adjusted_width
+    apply_column_widths(ws_data, column_widths)
+
+
+def _dashboard_table_styles(alignment, border):
+    """
+    NamedStyles of the Dashboard summary table: header, body, percentage
+    body, Total row and Total percentage
+    """
+    styles = {}
+    for key, name, fill, bold, number_format in [
+        ('header', 'PSA Table Header', 'B4C7E7', True, 'General'),
+        ('cell', 'PSA Table Cell', None, False, 'General'),
+        ('percent', 'PSA Table Percent', None, False, '0.00'),
+        ('total', 'PSA Table Total', 'FFC000', True, 'General'),
+        ('total_percent', 'PSA Table Total Percent', 'FFC000', True, '0.00'),
+    ]:
+        style = NamedStyle(name=name, alignment=alignment, border=border, number_format=number_format)
+        if fill:
+            style.fill = PatternFill(start_color=fill, end_color=fill, fill_type='solid')
+        # Body cells keep the workbook's default font, as unstyled cells would
+        style.font = Font(bold=True) if bold else copy(DEFAULT_FONT)
+        styles[key] = style
+    return styles
+
+
+def create_interactive_dashboard(csv_file, output_file='PSA_Interactive_Dashboard.xlsx',
+                                 streaming=False, chunk_size=50000, width_sample_size=None,
+                                 incremental=False, out_of_core=False, workers=1, dashboard_filters=None,
+                                 build_cache=True):
+    """
+    Create an interactive dashboard with proper column mapping from PSA Database CSV file
+
+    With streaming=True the workbook is written in write-only mode: SourceData
+    rows are streamed to disk in chunks of chunk_size, so memory used by the
+    workbook stays flat regardless of the number of CSV rows.
+
+    Column widths are computed from the DataFrames before writing; set
+    width_sample_size to measure at most that many values per column.
+
+    With incremental=True the summary is refreshed month by month, reusing
+    the stored aggregates of every Month whose rows did not change.
+
+    With out_of_core=True the CSV is never loaded whole: the summary is folded
+    from chunk_size-row chunks of the columns it needs, then SourceData is
+    streamed from a second chunked read (this implies streaming, and column
+    widths are measured on the first chunk).
+
+    With workers > 1 the summary is aggregated on a pool of that many
+    processes over shared memory; the result is identical.
+
+    The summary is aggregated once into a filter cube over Tag, Affiliate,
+    DIV_NAME and Month; the Dashboard sheet shows the slice given by
+    dashboard_filters (key -> value, default DEFAULT_DASHBOARD_FILTERS),
+    with its total read from the cube.
+
+    With build_cache=True a workbook already built from the same CSV content,
+    settings and code is copied into place instead of being rebuilt, and the
+    cube aggregates are reused whenever only the layout code changed.
+    """
     
-    # ========== CREATE SUMMARY SHEET ==========
-    ws_summary = wb.create_sheet('SummaryData', 1)
+    summary_keys = list(SUMMARY_KEYS)
+    cube_sets = cube_grouping_sets(summary_keys)
+    if dashboard_filters is None:
+        dashboard_filters = DEFAULT_DASHBOARD_FILTERS
+    if out_of_core:
+        streaming = True
+    
+    # Build cache: the aggregates are keyed by the CSV content and the engine
+    # code, the workbook additionally by the layout settings and this script
+    cached_aggregates = None
+    if build_cache:
+        psa_trace.begin("build_cache")
+        source_sha256 = source_digest(csv_file)
+        aggregate_key = build_key("dashboard", source_sha256, summary_keys, DASHBOARD_METRICS,
+                                  code_digest(ENGINE_MODULES))
+        layout_settings = {"streaming": streaming, "out_of_core": out_of_core,
+                           "width_sample_size": width_sample_size, "dashboard_filters": dashboard_filters}
+        if out_of_core:
+            # Out of core, SourceData column widths are measured on the first chunk
+            layout_settings["chunk_size"] = chunk_size
+        output_key = build_key(aggregate_key, layout_settings, code_digest([__file__, "excel_writer"]))
+        if restore_output(output_key, output_file):
+            psa_trace.end()
+            print(f"✓ CSV, settings and code unchanged: dashboard restored from the build cache → {output_file}")
+            return output_file
+        cached_aggregates = load_aggregates(aggregate_key)
+        if cached_aggregates is not None:
+            print("Reusing the cached summary aggregates...")
+    
+    if out_of_core:
+        if cached_aggregates is not None:
+            cube_results, total_records = cached_aggregates
+        else:
+            print("Aggregating CSV in chunks...")
+            psa_trace.begin("aggregate_chunks")
+            summary_columns = summary_keys + sorted(metric_columns(DASHBOARD_METRICS))
+            cube_results, total_records = summarize_chunks(
+                iter_csv_chunks(csv_file, summary_columns, chunk_size), summary_keys, DASHBOARD_METRICS, cube_sets)
+        source_columns = pd.read_csv(csv_file, nrows=0).columns.tolist()
+        df = None
+        psa_trace.set_rows(total_records)
+    else:
+        # Read the CSV file (memory-mapped from the columnar cache when unchanged)
+        print("Reading CSV file...")
+        psa_trace.begin("load")
+        load_stats = {}
+        df = load_psa_data(csv_file, compact=True, stats=load_stats)
+        print(f"Loaded {describe_load(load_stats)}")
+        total_records = len(df)
+        psa_trace.set_rows(total_records)
+        source_columns = df.columns.tolist()
+    
+    print(f"Total records: {total_records}")
+    print(f"Columns: {source_columns}")
     
-    print("Creating summary data...")
+    # Create a new workbook
+    wb = openpyxl.Workbook(write_only=streaming)
     
-    # Group and aggregate data properly
-    summary = df.groupby(['Tag', 'Affiliate', 'DIV_NAME', 'Month']).agg({
-        'HCP Selection Request ID': 'count',  # Count of HCP Selection Requests
-        'Is PSA Created': 'sum',  # Sum of PSA Created (1s)
-        'PSA Activity Executed': 'sum'  # Sum of PSA Activity Executed (1s)
-    }).reset_index()
+    # Remove default sheet
+    if 'Sheet' in wb.sheetnames:
+        wb.remove(wb['Sheet'])
+    
+    # ========== CREATE DATA SHEET ==========
+    ws_data = wb.create_sheet('SourceData', 0)
+    
+    print("Writing source data...")
+    psa_trace.begin("source_data", rows=total_records)
+    
+    if streaming:
+        if out_of_core:
+            source_chunks = iter_csv_chunks(csv_file, chunksize=chunk_size)
+            first_chunk = next(source_chunks, pd.DataFrame(columns=source_columns))
+            with psa_trace.stage("column_sizing", rows=len(first_chunk)):
+                source_widths = dataframe_column_widths(first_chunk, sample_size=width_sample_size)
+            write_frames_streaming(ws_data, source_columns, itertools.chain([first_chunk], source_chunks),
+                                   '4472C4', 'SourceDataTable', 'TableStyleMedium9',
+                                   column_widths=source_widths)
+        else:
+            with psa_trace.stage("column_sizing", rows=total_records):
+                source_widths = dataframe_column_widths(df, sample_size=width_sample_size)
+            write_dataframe_streaming(ws_data, df, '4472C4', 'SourceDataTable', 'TableStyleMedium9',
+                                      column_widths=source_widths, chunk_size=chunk_size)
+        # The remaining sheets are small; build them in memory and copy them
+        # into the write-only workbook before saving
+        layout = openpyxl.Workbook()
+        layout.remove(layout['Sheet'])
+    else:
+        with psa_trace.stage("column_sizing", rows=total_records):
+            source_widths = dataframe_column_widths(df, sample_size=width_sample_size)
+        _write_source_data(ws_data, df, source_widths)
+        layout = wb
     
-    # Rename columns for clarity
-    summary.columns = ['Tag', 'Affiliate', 'DIV_NAME', 'Month', 
-                       'HCP_Selection_Request_Count', 'PSA_Created_Count', 'PSA_Activity_Executed_Count']
+    # ========== CREATE SUMMARY SHEET ==========
+    ws_summary = layout.create_sheet('SummaryData', 1)
     
-    # Calculate percentages
-    summary['PSA_Created_Percent'] = (summary['PSA_Created_Count'] / summary['HCP_Selection_Request_Count'] * 100).round(2)
-    summary['PSA_Executed_Percent'] = summary.apply(
-        lambda x: (x['PSA_Activity_Executed_Count'] / x['PSA_Created_Count'] * 100) if x['PSA_Created_Count'] > 0 else 0, 
-        axis=1
-    ).round(2)
+    print("Creating summary data...")
     
-    # Replace NaN with 0
-    summary = summary.fillna(0)
+    # Group and aggregate data properly (metric definitions live in psa_summary)
+    # (out of core, the summary was already folded from the CSV chunks)
+    if cached_aggregates is not None:
+        cube_results = cached_aggregates[0]
+    elif not out_of_core:
+        psa_trace.begin("aggregate", rows=total_records)
+        if incremental:
+            cube_results, refresh_stats = refresh_summary(df, summary_keys, DASHBOARD_METRICS, cube_sets,
+                                                          name="dashboard")
+            print(f"Months re-aggregated: {refresh_stats['recomputed'] or 'none'}, "
+                  f"reused: {len(refresh_stats['reused'])}")
+        elif workers > 1:
+            cube_results = parallel_rollup_metrics(df, summary_keys, DASHBOARD_METRICS, cube_sets,
+                                                   workers=workers)
+        else:
+            cube_results = rollup_metrics(df, summary_keys, DASHBOARD_METRICS, cube_sets)
+    
+    # Every Tag / Affiliate / DIV_NAME / Month slice, from one aggregation;
+    # the finest level is the summary itself
+    summary = cube_results[0]
+    cube = FilterCube(summary_keys, DASHBOARD_METRICS, cube_results)
+    if build_cache and cached_aggregates is None:
+        store_aggregates(aggregate_key, (cube_results, total_records))
     
     print(f"Summary records: {len(summary)}")
     
+    psa_trace.begin("summary_sheet", rows=len(summary))
+    
     # Write summary headers
     summary_headers = list(summary.columns)
     for col_idx, col_name in enumerate(summary_headers, start=1):
@@ -122,27 +265,15 @@ def create_interactive_dashboard(csv_file, output_file='PSA_Interactive_Dashboar
     ws_summary.add_table(summary_table)
     
     # Auto-fit columns
-    for column in ws_summary.columns:
-        max_length = 0
-        column_letter = get_column_letter(column[0].column)
-        for cell in column:
-            try:
-                if cell.value:
-                    max_length = max(max_length, len(str(cell.value)))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws_summary.column_dimensions[column_letter].width = adjusted_width
+    apply_column_widths(ws_summary, dataframe_column_widths(summary, sample_size=width_sample_size))
     
     # ========== CREATE DASHBOARD SHEET ==========
-    ws_dashboard = wb.create_sheet('Dashboard', 2)
+    ws_dashboard = layout.create_sheet('Dashboard', 2)
     
     print("Creating dashboard...")
+    psa_trace.begin("dashboard_sheet")
     
-    # Define styles
-    header_fill = PatternFill(start_color='B4C7E7', end_color='B4C7E7', fill_type='solid')
-    total_fill = PatternFill(start_color='FFC000', end_color='FFC000', fill_type='solid')
-    bold_font = Font(bold=True)
+    # Define styles (the summary table's are registered once as NamedStyles)
     center_align = Alignment(horizontal='center', vertical='center')
     thin_border = Border(
         left=Side(style='thin'),
@@ -150,6 +281,7 @@ def create_interactive_dashboard(csv_file, output_file='PSA_Interactive_Dashboar
         top=Side(style='thin'),
         bottom=Side(style='thin')
     )
+    table_styles = _dashboard_table_styles(center_align, thin_border)
     
     # Title
     ws_dashboard['A1'] = 'PSA ACTIVITY DASHBOARD'
@@ -188,110 +320,40 @@ def create_interactive_dashboard(csv_file, output_file='PSA_Interactive_Dashboar
     ws_dashboard[f'A{start_row}'].alignment = center_align
     ws_dashboard.merge_cells(f'A{start_row}:M{start_row}')
     
-    # Column headers
-    headers_row = start_row + 1
+    # Column headers and the selected slice, one row per summary cell,
+    # straight from the cube
     display_headers = [
         'Tag', 'Affiliate', 'Division Name', 'Month',
         'HCP Selection Request', 'PSA Created', 'PSA Created %',
         'PSA Activity Executed', 'PSA Executed %'
     ]
+    filtered_summary = cube.rows(dashboard_filters)
+    slice_totals = cube.lookup(dashboard_filters)
     
-    for col_idx, header in enumerate(display_headers, start=1):
-        cell = ws_dashboard.cell(row=headers_row, column=col_idx)
-        cell.value = header
-        cell.fill = header_fill
-        cell.font = bold_font
-        cell.alignment = center_align
-        cell.border = thin_border
-    
-    # Write sample data (filtered to show concept)
-    # Filter for ASC and Aug'25 Outside of Project Shield
-    filtered_summary = summary[
-        (summary['Affiliate'] == 'ASC') & 
-        (summary['Month'] == "Aug'25") &
-        (summary['Tag'] == 'Outside of Project Shield')
-    ].copy()
-    
-    data_start_row = headers_row + 1
-    current_row = data_start_row
-    
-    for idx, row in filtered_summary.iterrows():
-        ws_dashboard.cell(row=current_row, column=1, value=row['Tag']).border = thin_border
-        ws_dashboard.cell(row=current_row, column=1).alignment = center_align
-        
-        ws_dashboard.cell(row=current_row, column=2, value=row['Affiliate']).border = thin_border
-        ws_dashboard.cell(row=current_row, column=2).alignment = center_align
-        
-        ws_dashboard.cell(row=current_row, column=3, value=row['DIV_NAME']).border = thin_border
-        ws_dashboard.cell(row=current_row, column=3).alignment = center_align
-        
-        ws_dashboard.cell(row=current_row, column=4, value=row['Month']).border = thin_border
-        ws_dashboard.cell(row=current_row, column=4).alignment = center_align
-        
-        ws_dashboard.cell(row=current_row, column=5, value=row['HCP_Selection_Request_Count']).border = thin_border
-        ws_dashboard.cell(row=current_row, column=5).alignment = center_align
-        
-        ws_dashboard.cell(row=current_row, column=6, value=row['PSA_Created_Count']).border = thin_border
-        ws_dashboard.cell(row=current_row, column=6).alignment = center_align
-        
-        cell_pct1 = ws_dashboard.cell(row=current_row, column=7, value=row['PSA_Created_Percent'])
-        cell_pct1.border = thin_border
-        cell_pct1.alignment = center_align
-        cell_pct1.number_format = '0.00'
-        
-        ws_dashboard.cell(row=current_row, column=8, value=row['PSA_Activity_Executed_Count']).border = thin_border
-        ws_dashboard.cell(row=current_row, column=8).alignment = center_align
-        
-        cell_pct2 = ws_dashboard.cell(row=current_row, column=9, value=row['PSA_Executed_Percent'])
-        cell_pct2.border = thin_border
-        cell_pct2.alignment = center_align
-        cell_pct2.number_format = '0.00'
-        
-        current_row += 1
+    table_columns = summary_keys + ['HCP_Selection_Request_Count', 'PSA_Created_Count', 'PSA_Created_Percent',
+                                    'PSA_Activity_Executed_Count', 'PSA_Executed_Percent']
+    percent_styles = {'PSA_Created_Percent': table_styles['percent'],
+                      'PSA_Executed_Percent': table_styles['percent']}
+    _, last_row = append_styled_table(
+        ws_dashboard, filtered_summary[table_columns], percent_styles,
+        header_style=table_styles['header'], headers=display_headers, default_style=table_styles['cell'])
     
     # Add Total row
-    total_row = current_row
-    ws_dashboard.cell(row=total_row, column=1, value='TOTAL').fill = total_fill
-    ws_dashboard.cell(row=total_row, column=1).font = bold_font
-    ws_dashboard.cell(row=total_row, column=1).border = thin_border
-    ws_dashboard.cell(row=total_row, column=1).alignment = center_align
-    ws_dashboard.merge_cells(f'A{total_row}:D{total_row}')
+    total_row = last_row + 1
     
     # Calculate totals
-    total_hcp = filtered_summary['HCP_Selection_Request_Count'].sum()
-    total_psa_created = filtered_summary['PSA_Created_Count'].sum()
-    total_psa_executed = filtered_summary['PSA_Activity_Executed_Count'].sum()
+    total_hcp = slice_totals['HCP_Selection_Request_Count']
+    total_psa_created = slice_totals['PSA_Created_Count']
+    total_psa_executed = slice_totals['PSA_Activity_Executed_Count']
     total_psa_created_pct = (total_psa_created / total_hcp * 100) if total_hcp > 0 else 0
     total_psa_executed_pct = (total_psa_executed / total_psa_created * 100) if total_psa_created > 0 else 0
     
-    ws_dashboard.cell(row=total_row, column=5, value=total_hcp).fill = total_fill
-    ws_dashboard.cell(row=total_row, column=5).font = bold_font
-    ws_dashboard.cell(row=total_row, column=5).border = thin_border
-    ws_dashboard.cell(row=total_row, column=5).alignment = center_align
-    
-    ws_dashboard.cell(row=total_row, column=6, value=total_psa_created).fill = total_fill
-    ws_dashboard.cell(row=total_row, column=6).font = bold_font
-    ws_dashboard.cell(row=total_row, column=6).border = thin_border
-    ws_dashboard.cell(row=total_row, column=6).alignment = center_align
-    
-    cell_total_pct1 = ws_dashboard.cell(row=total_row, column=7, value=total_psa_created_pct)
-    cell_total_pct1.fill = total_fill
-    cell_total_pct1.font = bold_font
-    cell_total_pct1.border = thin_border
-    cell_total_pct1.alignment = center_align
-    cell_total_pct1.number_format = '0.00'
-    
-    ws_dashboard.cell(row=total_row, column=8, value=total_psa_executed).fill = total_fill
-    ws_dashboard.cell(row=total_row, column=8).font = bold_font
-    ws_dashboard.cell(row=total_row, column=8).border = thin_border
-    ws_dashboard.cell(row=total_row, column=8).alignment = center_align
-    
-    cell_total_pct2 = ws_dashboard.cell(row=total_row, column=9, value=total_psa_executed_pct)
-    cell_total_pct2.fill = total_fill
-    cell_total_pct2.font = bold_font
-    cell_total_pct2.border = thin_border
-    cell_total_pct2.alignment = center_align
-    cell_total_pct2.number_format = '0.00'
+    total_styles = [table_styles['total'], None, None, None, table_styles['total'], table_styles['total'],
+                    table_styles['total_percent'], table_styles['total'], table_styles['total_percent']]
+    append_styled_rows(ws_dashboard, [['TOTAL', None, None, None, total_hcp, total_psa_created,
+                                       total_psa_created_pct, total_psa_executed, total_psa_executed_pct]],
+                       total_styles)
+    ws_dashboard.merge_cells(f'A{total_row}:D{total_row}')
     
     # Set column widths
     column_widths = {
@@ -304,7 +366,8 @@ def create_interactive_dashboard(csv_file, output_file='PSA_Interactive_Dashboar
     
     # Add summary statistics
     stats_row = total_row + 3
-    ws_dashboard[f'A{stats_row}'] = 'QUICK STATS (Current Filter: ASC, Aug\'25, Outside of Project Shield)'
+    filter_label = ', '.join(str(value) for value in dashboard_filters.values()) or 'All data'
+    ws_dashboard[f'A{stats_row}'] = f'QUICK STATS (Current Filter: {filter_label})'
     ws_dashboard[f'A{stats_row}'].font = Font(bold=True, size=11)
     ws_dashboard.merge_cells(f'A{stats_row}:M{stats_row}')
     
@@ -318,7 +381,8 @@ def create_interactive_dashboard(csv_file, output_file='PSA_Interactive_Dashboar
     ws_dashboard[f'A{stats_row}'] = f'Total Records in Summary: {len(filtered_summary)}'
     
     # ========== CREATE INSTRUCTIONS SHEET ==========
-    ws_instructions = wb.create_sheet('Instructions', 3)
+    psa_trace.begin("instructions_sheet")
+    ws_instructions = layout.create_sheet('Instructions', 3)
     
     instructions = [
         ['PSA ACTIVITY DASHBOARD - USER GUIDE', ''],
@@ -370,20 +434,31 @@ def create_interactive_dashboard(csv_file, output_file='PSA_Interactive_Dashboar
     
     ws_instructions.column_dimensions['A'].width = 80
     
+    if streaming:
+        psa_trace.begin("copy_sheets")
+        for ws in layout.worksheets:
+            copy_to_write_only(ws, wb.create_sheet(ws.title))
+    
     # Save workbook
     print(f"Saving workbook to {output_file}...")
+    psa_trace.begin("save")
     wb.save(output_file)
+    if build_cache:
+        store_output(output_key, output_file, info=layout_settings)
+    psa_trace.end()
     
     print("\n" + "="*80)
     print("✓ Dashboard created successfully!")
     print("="*80)
     print(f"\nFile saved as: {output_file}")
     print(f"\nSummary:")
-    print(f"  • Total source records: {len(df)}")
+    print(f"  • Total source records: {total_records}")
     print(f"  • Summary records: {len(summary)}")
-    print(f"  • Unique affiliates: {df['Affiliate'].nunique()}")
-    print(f"  • Unique months: {df['Month'].nunique()}")
-    print(f"  • Unique divisions: {df['DIV_NAME'].nunique()}")
+    # Out of core there are no rows left to scan; the summary holds every key
+    key_source = summary if df is None else df
+    print(f"  • Unique affiliates: {key_source['Affiliate'].nunique()}")
+    print(f"  • Unique months: {key_source['Month'].nunique()}")
+    print(f"  • Unique divisions: {key_source['DIV_NAME'].nunique()}")
     print("\nNext Steps:")
     print("  1. Open the Excel file")
     print("  2. Go to 'SummaryData' sheet")
@@ -395,35 +470,59 @@ def create_interactive_dashboard(csv_file, output_file='PSA_Interactive_Dashboar
 
 # Run the script
 if __name__ == "__main__":
-    csv_file = "PSA Database.csv"
-    output_file = "PSA_Interactive_Dashboard.xlsx"
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Generate the PSA interactive dashboard workbook")
+    parser.add_argument("csv_file", nargs="?", default="PSA Database.csv")
+    parser.add_argument("output_file", nargs="?", default="PSA_Interactive_Dashboard.xlsx")
+    parser.add_argument("--streaming", action="store_true",
+                        help="write the workbook in write-only mode with bounded memory")
+    parser.add_argument("--chunk-size", type=int, default=50000,
+                        help="rows per chunk when streaming SourceData")
+    parser.add_argument("--width-sample-size", type=int, default=None,
+                        help="measure at most this many values per column when sizing columns")
+    parser.add_argument("--incremental", action="store_true",
+                        help="re-aggregate only the Months whose rows changed since the last run")
+    parser.add_argument("--out-of-core", action="store_true",
+                        help="read the CSV in chunks instead of loading it whole (implies --streaming)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="aggregate the summary on this many processes")
+    parser.add_argument("--filter", action="append", metavar="KEY=VALUE", default=None,
+                        help="Dashboard slice, e.g. --filter Affiliate=AIL --filter \"Month=Sep'25\" "
+                             "(repeatable; keys: Tag, Affiliate, DIV_NAME, Month; default: ASC, Aug'25, "
+                             "Outside of Project Shield); --filter all shows every slice")
+    parser.add_argument("--trace", metavar="FILE", default=None,
+                        help=f"write per-stage timings as a Chrome trace-event file (or set {psa_trace.TRACE_ENV})")
+    parser.add_argument("--profile", metavar="STAGES", default=None,
+                        help=f"comma-separated stages to run under cProfile, or 'all' (or set {psa_trace.PROFILE_ENV})")
+    parser.add_argument("--no-build-cache", action="store_true",
+                        help="always rebuild the workbook and the summary, ignoring (and not updating) .psa_build")
+    args = parser.parse_args()
+    
+    dashboard_filters = None
+    if args.filter:
+        dashboard_filters = {}
+        for item in args.filter:
+            if item.lower() == 'all':
+                continue
+            key, sep, value = item.partition('=')
+            key = key.strip()
+            if not sep or not key:
+                parser.error(f"--filter expects KEY=VALUE, got {item!r}")
+            if key not in SUMMARY_KEYS:
+                parser.error(f"--filter key {key!r} is not a dashboard filter; use one of {', '.join(SUMMARY_KEYS)}")
+            dashboard_filters[key] = value
+    psa_trace.start_tracing(args.trace, args.profile)
     
     try:
-        create_interactive_dashboard(csv_file, output_file)
+        create_interactive_dashboard(args.csv_file, args.output_file,
+                                     streaming=args.streaming, chunk_size=args.chunk_size,
+                                     width_sample_size=args.width_sample_size,
+                                     incremental=args.incremental, out_of_core=args.out_of_core,
+                                     workers=args.workers, dashboard_filters=dashboard_filters,
+                                     build_cache=not args.no_build_cache)
     except Exception as e:
         print(f"\n❌ Error: {str(e)}")
         import traceback
         traceback.print_exc()
-Key Features of this Dashboard:
-Proper Column Mapping:
-HCP Selection Request ID → counts requests
-Is PSA Created → sums to get total PSAs created
-PSA Activity Executed → sums to get total executed
-Percentages calculated correctly
-Three Sheets:
-SourceData: Raw data with Excel Table
-SummaryData: Aggregated data with filters (interactive)
-Dashboard: Visual presentation
-Instructions: User guide
-Interactive Features:
-Use column filters in SummaryData sheet
-Can insert Excel slicers manually (instructions provided)
-All data properly formatted as Excel Tables
-To Add Slicers (in Excel):
-Open the file
-Go to SummaryData sheet
-Click any cell in the table
-Go to Insert > Slicer
-Select: Tag, Affiliate, Month, DIV_NAME
-Click OK
-The dashboard now has proper calculations and true interactivity! 🎯
+    psa_trace.finish_tracing()
@@ -0,0 +1,185 @@
+import pandas as pd
+from copy import copy
+from openpyxl.cell import Cell, WriteOnlyCell
+from openpyxl.styles import PatternFill, Font
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.table import Table, TableStyleInfo
+
+
+def frame_rows(frame):
+    """
+    Yield the rows of a DataFrame as plain tuples, converting it one column
+    at a time so no per-row Series is ever built
+    """
+    columns = []
+    for col in frame.columns:
+        values = frame[col].to_numpy(dtype=object, copy=True)
+        # Missing values become empty cells, same as the in-memory writer
+        values[pd.isna(frame[col]).to_numpy()] = None
+        columns.append(values)
+    yield from zip(*columns)
+
+
+def dataframe_column_widths(df, max_width=50, sample_size=None):
+    """
+    Compute auto-fit widths (longest value or header + 2, capped) for every
+    column of a DataFrame in one vectorised pass.
+
+    With sample_size set, columns longer than that are measured on a seeded
+    random sample of sample_size values instead of every value.
+    """
+    widths = []
+    for col in df.columns:
+        values = df[col].dropna()
+        if sample_size is not None and len(values) > sample_size:
+            values = values.sample(n=sample_size, random_state=0)
+        max_length = len(str(col))
+        if len(values):
+            max_length = max(max_length, int(values.astype(str).str.len().max()))
+        widths.append(min(max_length + 2, max_width))
+    return widths
+
+
+def apply_column_widths(ws, column_widths):
+    """
+    Set the width of each worksheet column from a list of widths (column A first)
+    """
+    for col_idx, width in enumerate(column_widths, start=1):
+        ws.column_dimensions[get_column_letter(col_idx)].width = width
+
+
+def write_frames_streaming(ws, columns, frames, header_color, table_name, table_style,
+                           column_widths=None):
+    """
+    Stream DataFrame chunks (all with the given columns) into a write-only
+    worksheet as one styled Excel Table. Returns the number of data rows.
+
+    Column widths must be known up front: a write-only sheet emits its
+    <cols> element before the first row.
+    """
+    if column_widths:
+        apply_column_widths(ws, column_widths)
+
+    header_fill = PatternFill(start_color=header_color, end_color=header_color, fill_type='solid')
+    header_font = Font(bold=True, color='FFFFFF')
+    header = []
+    for col_name in columns:
+        cell = WriteOnlyCell(ws, value=col_name)
+        cell.fill = header_fill
+        cell.font = header_font
+        header.append(cell)
+    ws.append(header)
+
+    n_rows = 0
+    for frame in frames:
+        for row in frame_rows(frame):
+            ws.append(row)
+        n_rows += len(frame)
+
+    table_ref = f"A1:{get_column_letter(len(columns))}{n_rows + 1}"
+    table = Table(displayName=table_name, ref=table_ref)
+    table.tableStyleInfo = TableStyleInfo(name=table_style, showFirstColumn=False,
+                                          showLastColumn=False, showRowStripes=True,
+                                          showColumnStripes=False)
+    ws.add_table(table)
+    return n_rows
+
+
+def write_dataframe_streaming(ws, df, header_color, table_name, table_style,
+                              column_widths=None, chunk_size=50000):
+    """
+    Stream a DataFrame into a write-only worksheet as a styled Excel Table,
+    chunk_size rows at a time
+    """
+    frames = (df.iloc[start:start + chunk_size] for start in range(0, len(df), chunk_size))
+    return write_frames_streaming(ws, list(df.columns), frames, header_color, table_name,
+                                  table_style, column_widths=column_widths)
+
+
+def register_named_styles(wb, styles):
+    """
+    Register NamedStyles with a workbook once per name and return the
+    registered style for each name
+    """
+    registered = {}
+    for style in styles:
+        if style.name not in wb.named_styles:
+            wb.add_named_style(style)
+        registered[style.name] = wb._named_styles[style.name]
+    return registered
+
+
+def append_styled_rows(ws, rows, styles):
+    """
+    Append rows to the end of a worksheet, styling each column's cells with
+    its NamedStyle (styles holds one per column, None for unstyled). Every
+    cell shares its style's resolved ids instead of building Font, Border
+    and Alignment objects cell by cell. Returns the number of rows appended.
+    """
+    registered = register_named_styles(ws.parent, [style for style in styles if style is not None])
+    arrays = [None if style is None else registered[style.name].as_tuple() for style in styles]
+    n_rows = 0
+    for row in rows:
+        ws.append([value if array is None else Cell(ws, value=value, style_array=copy(array))
+                   for value, array in zip(row, arrays)])
+        n_rows += 1
+    return n_rows
+
+
+def append_styled_table(ws, frame, column_styles, header_style=None, headers=None, default_style=None):
+    """
+    Append a DataFrame as a table at the end of a worksheet: a header row
+    (headers, default the column names) in header_style, then the rows with
+    each column in its NamedStyle from column_styles (default_style for
+    columns not in it). Returns the sheet rows of the header and of the
+    last data row.
+    """
+    headers = list(frame.columns) if headers is None else headers
+    append_styled_rows(ws, [headers], [header_style] * len(headers))
+    header_row = ws.max_row
+    styles = [column_styles.get(col, default_style) for col in frame.columns]
+    n_rows = append_styled_rows(ws, frame_rows(frame), styles)
+    return header_row, header_row + n_rows
+
+
+def copy_to_write_only(src, dst):
+    """
+    Copy a small in-memory worksheet (cells, styles, merges, dimensions and
+    tables) into a write-only worksheet
+    """
+    for key, dim in src.column_dimensions.items():
+        if dim.width:
+            dst.column_dimensions[key].width = dim.width
+    for key, dim in src.row_dimensions.items():
+        if dim.height:
+            dst.row_dimensions[key].height = dim.height
+    for merged in src.merged_cells.ranges:
+        dst.merged_cells.add(merged.coord)
+    for table in src.tables.values():
+        dst.add_table(table)
+
+    # Each distinct source style is rebuilt once, on the first cell using it,
+    # and its ids shared by the rest; named styles carry over by name
+    styles = {}
+    for row in src.iter_rows():
+        out = []
+        for cell in row:
+            if cell.value is None and not cell.has_style:
+                out.append(None)
+                continue
+            new_cell = WriteOnlyCell(dst, value=cell.value)
+            if cell.has_style:
+                key = tuple(cell._style)
+                if key not in styles:
+                    if cell.style != "Normal":
+                        register_named_styles(dst.parent, [copy(src.parent._named_styles[cell.style])])
+                        new_cell.style = cell.style
+                    new_cell.font = copy(cell.font)
+                    new_cell.fill = copy(cell.fill)
+                    new_cell.border = copy(cell.border)
+                    new_cell.alignment = copy(cell.alignment)
+                    new_cell.number_format = cell.number_format
+                    styles[key] = new_cell._style
+                new_cell._style = copy(styles[key])
+            out.append(new_cell)
+        dst.append(out)
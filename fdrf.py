@@ -1,19 +1,27 @@
 import pandas as pd
 import os
+from psa_loader import load_psa_data, describe_load
+from psa_summary import rollup_metrics, FINAL_SUMMARY_METRICS
+from psa_incremental import refresh_summary
+from psa_parallel import parallel_rollup_metrics
+from psa_dates import last_window, in_window, DATE_COLUMN
+from psa_build_cache import (source_digest, code_digest, build_key, load_aggregates, store_aggregates,
+                             restore_output, store_output, ENGINE_MODULES)
+import psa_trace
 
 # === CONFIGURATION ===
-database_file = "Database.xlsx"         # Input file (from system or shared location)
+database_file = os.environ.get("PSA_DATABASE", "Database.xlsx")   # Input file: .xlsx, .xlsb or .csv (or set PSA_DATABASE)
+database_sheet = None                   # Sheet to read (name or 0-based index); None = first sheet
 output_file = "Final_Summary_Output.xlsx"   # Auto-generated output file
+incremental_refresh = False             # Re-aggregate only the Months whose rows changed since the last run
+last_weeks = None                       # e.g. 4: summarise only the last 4 weeks of Created Date
+approximate_error = None                # e.g. 0.02: HyperLogLog estimates (±2%) instead of exact unique counts
+workers = 1                             # >1: aggregate on that many processes (exact counts, Linux/macOS)
+trace_file = None                       # e.g. "fdrf_trace.json": per-stage timings (or set PSA_TRACE)
+build_cache = os.environ.get("PSA_BUILD_CACHE") != "0"   # Reuse stored aggregates and output when nothing changed (PSA_BUILD_CACHE=0: off)
 
-# === STEP 1: Load Database File ===
-try:
-    df = pd.read_excel(database_file)
-    print("✅ Database file loaded successfully.")
-except FileNotFoundError:
-    print(f"❌ Error: '{database_file}' not found. Please check the file path.")
-    exit()
+psa_trace.start_tracing(trace_file)
 
-# === STEP 2: Validate Required Columns ===
 required_columns = [
     "Affiliate",
     "DIV_NAME",
@@ -21,56 +29,110 @@ required_columns = [
     "Is PSA Created",
     "PSA Activity Executed"
 ]
+if incremental_refresh:
+    required_columns.append("Month")
+if last_weeks:
+    required_columns.append(DATE_COLUMN)
 
-missing_columns = [col for col in required_columns if col not in df.columns]
-if missing_columns:
-    print(f"❌ Missing columns in the Database file: {missing_columns}")
+if incremental_refresh and approximate_error is not None:
+    print("❌ Incremental refresh keeps exact ID sets; it cannot be combined with approximate_error.")
+    exit()
+if incremental_refresh and last_weeks:
+    print("❌ Incremental refresh keeps every Month's aggregates; it cannot be combined with last_weeks.")
     exit()
 
-# === STEP 3: Compute Summary by Affiliate and DIV_NAME ===
-summary_rows = []
+# === STEP 0: Check the Build Cache ===
+# Keyed by the source's content hash, the settings and the code, so a run
+# over unchanged data neither reloads nor re-aggregates it
+cached_summary = None
+if build_cache:
+    try:
+        source_sha256 = source_digest(database_file)
+    except FileNotFoundError:
+        print(f"❌ Error: '{database_file}' not found. Please check the file path.")
+        exit()
+    build_settings = {"sheet": database_sheet, "approximate_error": approximate_error, "last_weeks": last_weeks}
+    aggregate_key = build_key("final_summary", source_sha256, build_settings, code_digest(ENGINE_MODULES))
+    output_key = build_key(aggregate_key, code_digest([__file__]))
+    cached_summary = load_aggregates(aggregate_key)
 
-# Group by Affiliate & DIV_NAME
-grouped = df.groupby(["Affiliate", "DIV_NAME"])
+if cached_summary is not None:
+    group_summary, total_summary = cached_summary
+    print("♻️ Database unchanged since it was last summarised: reusing the stored aggregates.")
+else:
+    # === STEP 1: Load Database File ===
+    # Only the required columns are parsed; served from the columnar cache when
+    # the workbook has not changed
+    psa_trace.begin("load")
+    try:
+        load_stats = {}
+        df = load_psa_data(database_file, columns=required_columns, compact=True, sheet=database_sheet,
+                           stats=load_stats, dates=bool(last_weeks))
+        psa_trace.set_rows(len(df))
+        print("✅ Database file loaded successfully.")
+        print(f"   {describe_load(load_stats)}")
+    except FileNotFoundError:
+        print(f"❌ Error: '{database_file}' not found. Please check the file path.")
+        exit()
 
-for (affiliate, div_name), group in grouped:
-    hcp_count = group["HCP Selection Request ID"].nunique()
-    psa_created_count = group.loc[group["Is PSA Created"] == 1, "HCP Selection Request ID"].nunique()
-    psa_executed_count = group.loc[group["PSA Activity Executed"] == 1, "HCP Selection Request ID"].nunique()
+    # === STEP 2: Validate Required Columns ===
+    missing_columns = [col for col in required_columns if col not in df.columns]
+    if missing_columns:
+        print(f"❌ Missing columns in the Database file: {missing_columns}")
+        exit()
 
-    psa_created_pct = round((psa_created_count / hcp_count) * 100, 2) if hcp_count > 0 else 0
-    psa_executed_pct = round((psa_executed_count / hcp_count) * 100, 2) if hcp_count > 0 else 0
+    # === STEP 2b: Keep the Last Weeks of Created Date ===
+    # One window: a single pass over the dates, no sorted index to build
+    if last_weeks:
+        window_start, window_end = last_window(df[DATE_COLUMN], weeks=last_weeks)
+        if window_start is None:
+            print(f"❌ No rows have a {DATE_COLUMN}; cannot keep the last {last_weeks} weeks.")
+            exit()
+        df = df[in_window(df[DATE_COLUMN], window_start, window_end)]
+        print(f"🗓️ Last {last_weeks} weeks of Created Date ({window_start:%d %b %Y} – "
+              f"{window_end - pd.Timedelta(days=1):%d %b %Y}): {len(df):,} rows")
 
-    summary_rows.append({
-        "Affiliate": affiliate,
-        "DIV_NAME": div_name,
-        "HCP Selection Request": hcp_count,
-        "PSA Created": psa_created_count,
-        "PSA Created %": psa_created_pct,
-        "PSA Activity Executed": psa_executed_count,
-        "PSA Executed %": psa_executed_pct
-    })
+    # === STEP 3: Compute Summary by Affiliate and DIV_NAME ===
+    # Final Summary metrics per group plus the grand total, rolled up from the
+    # same deduplicated pairs so IDs shared across groups are counted once
+    psa_trace.begin("aggregate", rows=len(df))
+    group_keys = ["Affiliate", "DIV_NAME"]
+    if incremental_refresh:
+        (group_summary, total_summary), refresh_stats = refresh_summary(
+            df, group_keys, FINAL_SUMMARY_METRICS, [group_keys, []], name="final_summary")
+        print(f"♻️ Months re-aggregated: {refresh_stats['recomputed'] or 'none'}, "
+              f"reused: {len(refresh_stats['reused'])}")
+    elif workers > 1 and approximate_error is None:
+        group_summary, total_summary = parallel_rollup_metrics(df, group_keys, FINAL_SUMMARY_METRICS,
+                                                               [group_keys, []], workers=workers)
+    else:
+        group_summary, total_summary = rollup_metrics(df, group_keys, FINAL_SUMMARY_METRICS, [group_keys, []],
+                                                      approximate=approximate_error)
+    if build_cache:
+        store_aggregates(aggregate_key, (group_summary, total_summary))
 
 # === STEP 4: Create DataFrame ===
-summary_df = pd.DataFrame(summary_rows)
+summary_df = group_summary
 
 # === STEP 5: Add Grand Total Row ===
 if not summary_df.empty:
-    total_row = {
-        "Affiliate": "Total",
-        "DIV_NAME": "",
-        "HCP Selection Request": summary_df["HCP Selection Request"].sum(),
-        "PSA Created": summary_df["PSA Created"].sum(),
-        "PSA Created %": round((summary_df["PSA Created"].sum() / summary_df["HCP Selection Request"].sum()) * 100, 2),
-        "PSA Activity Executed": summary_df["PSA Activity Executed"].sum(),
-        "PSA Executed %": round((summary_df["PSA Activity Executed"].sum() / summary_df["HCP Selection Request"].sum()) * 100, 2)
-    }
-    summary_df = pd.concat([summary_df, pd.DataFrame([total_row])], ignore_index=True)
+    total_summary["Affiliate"] = "Total"
+    total_summary["DIV_NAME"] = ""
+    summary_df = pd.concat([summary_df, total_summary], ignore_index=True)
 
 # === STEP 6: Export to Excel ===
-summary_df.to_excel(output_file, index=False)
-print(f"✅ Affiliate & DIV_NAME-wise Final Summary generated → {os.path.abspath(output_file)}")
+psa_trace.begin("export", rows=len(summary_df))
+if build_cache and restore_output(output_key, output_file):
+    print(f"✅ Affiliate & DIV_NAME-wise Final Summary unchanged, restored from the build cache → "
+          f"{os.path.abspath(output_file)}")
+else:
+    summary_df.to_excel(output_file, index=False)
+    if build_cache:
+        store_output(output_key, output_file, info=build_settings)
+    print(f"✅ Affiliate & DIV_NAME-wise Final Summary generated → {os.path.abspath(output_file)}")
 
 # === STEP 7: Display in Console ===
+psa_trace.begin("display", rows=len(summary_df))
 print("\n📊 Final Summary (Affiliate & DIV_NAME-wise):")
 print(summary_df.to_string(index=False))
+psa_trace.finish_tracing()
@@ -0,0 +1,138 @@
+import argparse
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from psa_loader import load_psa_data
+from psa_parallel import pool_context
+from psa_summary import rollup_metrics, FINAL_SUMMARY_METRICS
+import psa_trace
+
+# Batch mode for the Final Summary (fdrf.py): one workbook per Affiliate, per
+# DIV_NAME or per pair. The source is loaded and aggregated once - a single
+# rollup gives the Affiliate × DIV_NAME rows together with each partition's
+# own total, whose unique counts are distinct within the partition - and the
+# workbooks are then written concurrently by a process pool.
+#
+#   python psa_batch.py Database.xlsx --by Affiliate
+#   python psa_batch.py Database.xlsx --by DIV_NAME --template "{DIV_NAME} Final Summary.xlsx"
+
+SUMMARY_KEYS = ["Affiliate", "DIV_NAME"]
+REQUIRED_COLUMNS = ["Affiliate", "DIV_NAME", "HCP Selection Request ID", "Is PSA Created", "PSA Activity Executed"]
+DEFAULT_TEMPLATE = "Final_Summary_{value}.xlsx"
+
+
+def _safe_name(value):
+    return re.sub(r'[\\/:*?"<>|]+', "_", str(value)).strip() or "_"
+
+
+def partition_summaries(df, by, metrics=FINAL_SUMMARY_METRICS):
+    """
+    Final Summary frames per partition of the by keys: the Affiliate ×
+    DIV_NAME rows of the partition followed by its Total row. Returns a list
+    of ({key: value}, frame) in sorted key order.
+    """
+    by = [key for key in SUMMARY_KEYS if key in by]
+    group_summary, partition_totals = rollup_metrics(df, SUMMARY_KEYS, metrics, [SUMMARY_KEYS, by])
+
+    partitions = []
+    groups = group_summary.groupby(by, sort=False, observed=True) if by else [((), group_summary)]
+    for values, rows in groups:
+        values = values if isinstance(values, tuple) else (values,)
+        match = pd.Series(True, index=partition_totals.index)
+        for key, value in zip(by, values):
+            match &= partition_totals[key] == value
+        total = partition_totals[match].copy()
+        total["Affiliate"] = "Total"
+        total["DIV_NAME"] = ""
+        frame = pd.concat([rows, total[rows.columns]], ignore_index=True)
+        partitions.append((dict(zip(by, values)), frame))
+    return partitions
+
+
+def output_name(template, values):
+    """
+    File name for a partition: template fields are the partition keys
+    ({Affiliate}, {DIV_NAME}) and {value}, the key values joined with "_"
+    """
+    fields = {key: _safe_name(value) for key, value in values.items()}
+    fields["value"] = "_".join(fields.values()) or "All"
+    try:
+        return template.format(**fields)
+    except KeyError as e:
+        raise ValueError(f"Template field {e} is not one of {sorted(fields)}") from None
+
+
+def _write_report(task):
+    """
+    Worker: write one partition's Final Summary workbook
+    """
+    path, frame = task
+    frame.to_excel(path, index=False)
+    return path, len(frame)
+
+
+def write_partitioned_reports(df, by, template=DEFAULT_TEMPLATE, output_dir=".", workers=None,
+                              metrics=FINAL_SUMMARY_METRICS):
+    """
+    Aggregate df once and write one workbook per partition of the by keys,
+    on up to workers processes (default: one per CPU). Returns the paths.
+    """
+    with psa_trace.stage("aggregate", rows=len(df)):
+        partitions = partition_summaries(df, by, metrics)
+    tasks = [(os.path.join(output_dir, output_name(template, values)), frame) for values, frame in partitions]
+    paths = [path for path, _ in tasks]
+    duplicates = sorted({path for path in paths if paths.count(path) > 1})
+    if duplicates:
+        raise ValueError(f"Template gives the same file name to several partitions: {duplicates}")
+    os.makedirs(output_dir, exist_ok=True)
+
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    with psa_trace.stage("write_reports", rows=len(tasks)):
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context()) as pool:
+                written = list(pool.map(_write_report, tasks))
+        else:
+            written = [_write_report(task) for task in tasks]
+    return [path for path, _ in written]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write one Final Summary workbook per Affiliate / DIV_NAME.")
+    parser.add_argument("source", nargs="?", default="Database.xlsx")
+    parser.add_argument("--by", default="Affiliate",
+                        help="Affiliate, DIV_NAME or Affiliate,DIV_NAME (default: Affiliate)")
+    parser.add_argument("--template", default=DEFAULT_TEMPLATE,
+                        help="output file name; fields {Affiliate}, {DIV_NAME}, {value} (default: %(default)s)")
+    parser.add_argument("--output-dir", default="reports")
+    parser.add_argument("--workers", type=int, default=None, help="writer processes (default: one per CPU)")
+    parser.add_argument("--trace", default=None, metavar="FILE", help="write per-stage timings to FILE")
+    args = parser.parse_args()
+
+    by = [key.strip() for key in args.by.split(",") if key.strip()]
+    unknown = [key for key in by if key not in SUMMARY_KEYS]
+    if unknown:
+        parser.error(f"--by accepts {SUMMARY_KEYS}, not {unknown}")
+
+    psa_trace.start_tracing(args.trace)
+    start = time.perf_counter()
+    try:
+        with psa_trace.stage("load") as info:
+            df = load_psa_data(args.source, columns=REQUIRED_COLUMNS, compact=True)
+            info["rows"] = len(df)
+    except FileNotFoundError:
+        print(f"❌ Error: '{args.source}' not found. Please check the file path.")
+        raise SystemExit(1)
+    print("✅ Database file loaded successfully.")
+
+    try:
+        paths = write_partitioned_reports(df, by, args.template, args.output_dir, args.workers)
+    except ValueError as e:
+        print(f"❌ {e}")
+        raise SystemExit(1)
+    print(f"✅ {len(paths)} {' & '.join(by)}-wise Final Summary workbooks written → "
+          f"{os.path.abspath(args.output_dir)} in {time.perf_counter() - start:.1f}s")
+    psa_trace.finish_tracing()
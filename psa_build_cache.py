@@ -0,0 +1,152 @@
+import hashlib
+import importlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+
+import pandas as pd
+
+from psa_loader import file_sha256
+
+BUILD_DIR = ".psa_build"
+MAX_ENTRIES = 16                # per kind (outputs, aggregates); least recently used go first
+
+# Modules whose code the aggregates depend on. A report script's own code
+# is left out of the aggregate key, so changing how a sheet looks re-renders
+# the workbook from the stored aggregates instead of re-aggregating.
+ENGINE_MODULES = ["psa_loader", "psa_readers", "psa_dates", "psa_summary", "psa_hll", "psa_cube",
+                  "psa_incremental", "psa_parallel"]
+
+# Content-addressed build cache for the report scripts. An output is stored
+# under a key made of everything that went into it: the source file's
+# SHA-256, the settings that shape the output, and a hash of the code that
+# produced it. A run whose key is already stored copies the stored file into
+# place instead of rebuilding it. Intermediate aggregates are kept the same
+# way under their own key.
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+def source_digest(path, build_dir=BUILD_DIR):
+    """
+    SHA-256 of a source file, remembered per path, size and mtime so an
+    unchanged file is not re-hashed on every run
+    """
+    stat = os.stat(path)
+    memo_path = os.path.join(build_dir, "sources.json")
+    try:
+        with open(memo_path, encoding="utf-8") as f:
+            memo = json.load(f)
+    except (OSError, ValueError):
+        memo = {}
+    name = os.path.abspath(path)
+    entry = memo.get(name)
+    if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+        return entry["sha256"]
+    digest = file_sha256(path)
+    memo[name] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest}
+    _write_json(memo_path, memo)
+    return digest
+
+
+def code_digest(modules):
+    """
+    Hash of the code of the given modules (module names, or paths of .py
+    files such as a script's __file__)
+    """
+    digest = hashlib.sha256()
+    for module in modules:
+        path = module if module.endswith(".py") else importlib.import_module(module).__file__
+        digest.update(os.path.basename(path).encode("utf-8"))
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def build_key(*parts):
+    """
+    Key for a build from JSON-serialisable parts (digests, settings)
+    """
+    spec = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(spec.encode("utf-8")).hexdigest()[:32]
+
+
+def _prune(directory, keep=MAX_ENTRIES):
+    entries = [os.path.join(directory, name) for name in os.listdir(directory) if not name.endswith(".tmp")]
+    entries.sort(key=os.path.getmtime, reverse=True)
+    for path in entries[keep:]:
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            os.remove(path)
+
+
+def restore_output(key, output_file, build_dir=BUILD_DIR):
+    """
+    Put the output stored under key at output_file; returns False when
+    nothing is stored under key
+    """
+    artifact = os.path.join(build_dir, "outputs", key, os.path.basename(output_file))
+    if not os.path.exists(artifact):
+        return False
+    target_dir = os.path.dirname(os.path.abspath(output_file))
+    fd, tmp = tempfile.mkstemp(dir=target_dir, suffix=".tmp")
+    os.close(fd)
+    shutil.copyfile(artifact, tmp)
+    os.replace(tmp, output_file)
+    os.utime(os.path.dirname(artifact))         # mark as recently used
+    return True
+
+
+def store_output(key, output_file, build_dir=BUILD_DIR, info=None):
+    """
+    Keep a copy of a freshly built output under key (info, e.g. the
+    settings, is saved next to it for inspection)
+    """
+    outputs = os.path.join(build_dir, "outputs")
+    os.makedirs(outputs, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=outputs, suffix=".tmp")
+    shutil.copyfile(output_file, os.path.join(tmp, os.path.basename(output_file)))
+    with open(os.path.join(tmp, "build.json"), "w", encoding="utf-8") as f:
+        json.dump(dict(info or {}, key=key, output=os.path.abspath(output_file)), f, indent=2, default=str)
+    target = os.path.join(outputs, key)
+    if os.path.exists(target):
+        shutil.rmtree(target)
+    os.replace(tmp, target)
+    _prune(outputs)
+
+
+def load_aggregates(key, build_dir=BUILD_DIR):
+    """
+    Aggregates stored under key, or None
+    """
+    path = os.path.join(build_dir, "aggregates", key + ".pkl")
+    if not os.path.exists(path):
+        return None
+    try:
+        value = pd.read_pickle(path)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+    os.utime(path)
+    return value
+
+
+def store_aggregates(key, value, build_dir=BUILD_DIR):
+    """
+    Store aggregates (DataFrames or tuples/lists of them) under key
+    """
+    aggregates = os.path.join(build_dir, "aggregates")
+    os.makedirs(aggregates, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=aggregates, suffix=".tmp")
+    os.close(fd)
+    pd.to_pickle(value, tmp)
+    os.replace(tmp, os.path.join(aggregates, key + ".pkl"))
+    _prune(aggregates)
@@ -0,0 +1,104 @@
+import itertools
+
+import pandas as pd
+
+from psa_summary import rollup_metrics
+
+# Precomputed filter cube: a metric set evaluated for every grouping set of
+# the keys (Tag × Affiliate × DIV_NAME × Month gives 16), so each slice's
+# totals come from the engine's rollup (distinct counts stay distinct) rather
+# than from adding up finer cells. Cells are indexed by their key values, with
+# None standing for "all values" of a key, so a filter combination is a dict
+# lookup and never touches source rows.
+
+
+def cube_grouping_sets(keys):
+    """
+    Every subset of keys, finest (all keys) first and grand total last
+    """
+    keys = list(keys)
+    return [[key for key, kept in zip(keys, mask) if kept]
+            for mask in itertools.product((True, False), repeat=len(keys))]
+
+
+def _label(value):
+    return None if pd.isna(value) else value
+
+
+class FilterCube:
+    """
+    Metric values for every slice of keys, from the results of a rollup over
+    cube_grouping_sets(keys)
+    """
+
+    def __init__(self, keys, metrics, results):
+        self.keys = list(keys)
+        self.metrics = list(metrics)
+        frames = [result.astype({key: object for key in self.keys}) for result in results]
+        frame = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=self.keys + self.metrics)
+        self.columns = [col for col in frame.columns if col not in self.keys]
+        self.frame = frame
+        self._arrays = {col: frame[col].to_numpy() for col in self.columns}
+
+        labels = [tuple(_label(value) for value in row) for row in frame[self.keys].itertuples(index=False)]
+        # Slice totals: key values (None = all) -> row
+        self._cells = {label: pos for pos, label in enumerate(labels)}
+        # Breakdowns: (broken-out keys, filter values) -> rows of that grouping
+        # set matching the filter, in sorted key order
+        self._members = {}
+        for pos, label in enumerate(labels):
+            present = [idx for idx, value in enumerate(label) if value is not None]
+            for size in range(len(present) + 1):
+                for by in itertools.combinations(present, size):
+                    pattern = tuple(None if idx in by else value for idx, value in enumerate(label))
+                    self._members.setdefault((by, pattern), []).append(pos)
+        self.values = {key: sorted({label[idx] for label in labels if label[idx] is not None})
+                       for idx, key in enumerate(self.keys)}
+
+    def _pattern(self, filters):
+        unknown = set(filters) - set(self.keys)
+        if unknown:
+            raise KeyError(f"Cube has no key(s) {sorted(unknown)}; keys are {self.keys}")
+        return tuple(filters.get(key) for key in self.keys)
+
+    def lookup(self, filters=None):
+        """
+        Metrics for one slice as a dict ({} is the grand total); a slice with
+        no rows gives zeros
+        """
+        pos = self._cells.get(self._pattern(filters or {}))
+        if pos is None:
+            return {col: 0 for col in self.columns}
+        return {col: values[pos].item() for col, values in self._arrays.items()}
+
+    def rows(self, filters=None, by=None):
+        """
+        Cells matching filters, broken out by the keys in by (default: every
+        key that is not filtered), with rolled-up keys left missing
+        """
+        filters = filters or {}
+        pattern = self._pattern(filters)
+        if by is None:
+            by = [key for key in self.keys if key not in filters]
+        overlap = set(by) & set(filters)
+        if overlap:
+            raise ValueError(f"Key(s) {sorted(overlap)} cannot be both filtered and broken out")
+        by_idx = tuple(sorted(self.keys.index(key) for key in by))
+        positions = self._members.get((by_idx, pattern), [])
+        return self.frame.iloc[positions].reset_index(drop=True)
+
+    def to_frame(self, all_label="All"):
+        """
+        Every cell of the cube, with rolled-up keys labelled all_label
+        """
+        frame = self.frame.copy()
+        frame[self.keys] = frame[self.keys].fillna(all_label)
+        return frame
+
+
+def build_cube(df, keys, metrics, approximate=None):
+    """
+    Aggregate rows once into a FilterCube over keys
+    """
+    results = rollup_metrics(df, keys, metrics, cube_grouping_sets(keys), approximate=approximate)
+    return FilterCube(keys, metrics, results)
@@ -0,0 +1,187 @@
+import numpy as np
+import pandas as pd
+
+# Created Date arrives as Excel serial numbers (45742 = 2025-03-26). They are
+# converted to datetime64 in one vectorised step, and the calendar buckets are
+# derived from the dates as ordered categoricals, so they sort by time (Jan'25
+# before Apr'25) and cannot drift from the dates the way a hand-kept Month
+# column can; they are worked out once per distinct date (a few hundred days,
+# however many rows). A one-off window is a single comparison per row
+# (last_window plus a mask); DateIndex, sorted once, answers repeated
+# time-range filters by binary search instead of comparing every row.
+
+EXCEL_EPOCH = "1899-12-30"      # serial 0; Excel's 1900 leap-year bug makes serials from 61 on count from here
+DATE_COLUMN = "Created Date"
+DATE_PREFIX = "Created"
+
+# Bucket name -> (period frequency, label of a period)
+BUCKETS = {
+    "Month": ("M", lambda period: period.strftime("%b'%y")),
+    "Week": ("W-SUN", lambda period: period.start_time.strftime("%G-W%V")),
+    "Quarter": ("Q", lambda period: f"Q{period.quarter}'{period.start_time.strftime('%y')}"),
+}
+
+
+def excel_serial_to_datetime(values):
+    """
+    Excel serial dates (days since EXCEL_EPOCH; fractions are the time of
+    day) as a datetime64[ns] Series. Blanks become NaT; values that are
+    already dates, or date strings, are parsed as such.
+    """
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.astype("datetime64[ns]")
+    epoch = np.datetime64(EXCEL_EPOCH, "ns")
+    if pd.api.types.is_integer_dtype(series) and not series.hasnans:
+        days = series.to_numpy(dtype=np.int64).astype("timedelta64[D]")
+        return pd.Series(epoch + days, index=series.index, name=series.name)
+
+    raw = series.astype(object) if isinstance(series.dtype, pd.CategoricalDtype) else series
+    serials = pd.to_numeric(raw, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    missing = np.isnan(serials)
+    nanos = np.round(np.where(missing, 0, serials) * 86_400e9).astype(np.int64)
+    dates = epoch + nanos.astype("timedelta64[ns]")
+    dates[missing] = np.datetime64("NaT")
+    result = pd.Series(dates, index=series.index, name=series.name)
+    if missing.any() and not pd.api.types.is_numeric_dtype(series):
+        # Text that is not a number may still be a date ("2025-03-25")
+        parsed = pd.to_datetime(raw[missing], errors="coerce", format="mixed")
+        result[missing] = parsed.astype("datetime64[ns]")
+    return result
+
+
+def _factorize_dates(dates):
+    """
+    (codes, distinct dates): codes number the distinct dates in time order,
+    -1 for NaT
+    """
+    values = np.asarray(dates, dtype="datetime64[ns]")
+    codes, uniques = pd.factorize(values, sort=True)
+    return codes, np.asarray(uniques, dtype="datetime64[ns]")
+
+
+def date_buckets(dates, bucket, factorized=None):
+    """
+    Ordered categorical of the bucket ("Month", "Week" or "Quarter") of each
+    date; categories are every period from the first date to the last, in
+    time order, so empty periods still have their place
+    """
+    freq, label = BUCKETS[bucket]
+    codes, uniques = factorized or _factorize_dates(dates)
+    if not len(uniques):
+        return pd.Categorical.from_codes(np.full(len(codes), -1), [], ordered=True)
+    ordinals = pd.DatetimeIndex(uniques).to_period(freq).asi8
+    calendar = pd.period_range(pd.Period(ordinal=ordinals[0], freq=freq),
+                               pd.Period(ordinal=ordinals[-1], freq=freq))
+    # Bucket code of each distinct date, with a trailing -1 for NaT (code -1)
+    bucket_codes = np.append(ordinals - ordinals[0], -1)
+    return pd.Categorical.from_codes(bucket_codes[codes], [label(period) for period in calendar], ordered=True)
+
+
+def add_date_buckets(df, column=DATE_COLUMN, prefix=DATE_PREFIX, buckets=tuple(BUCKETS)):
+    """
+    df with column converted from Excel serials to datetime64 and one ordered
+    categorical per bucket added as "<prefix> <bucket>" (Created Month,
+    Created Week, Created Quarter)
+    """
+    return _with_buckets(df, column, prefix, buckets)[0]
+
+
+def add_date_index(df, column=DATE_COLUMN, prefix=DATE_PREFIX, buckets=tuple(BUCKETS)):
+    """
+    (add_date_buckets(df), DateIndex of its dates), converting and
+    factorizing the dates once for both
+    """
+    df, factorized = _with_buckets(df, column, prefix, buckets)
+    return df, DateIndex(df[column], factorized)
+
+
+def _with_buckets(df, column, prefix, buckets):
+    dates = excel_serial_to_datetime(df[column])
+    factorized = _factorize_dates(dates)
+    columns = {column: dates}
+    for bucket in buckets:
+        columns[f"{prefix} {bucket}"] = pd.Series(date_buckets(dates, bucket, factorized), index=df.index)
+    return df.assign(**columns), factorized
+
+
+def as_datetime64(dates):
+    """
+    dates as a datetime64[ns] array, converted from Excel serials only if
+    they are not dates already
+    """
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        return np.asarray(dates, dtype="datetime64[ns]")
+    return excel_serial_to_datetime(dates).to_numpy(dtype="datetime64[ns]")
+
+
+def last_window(dates, days=0, weeks=0):
+    """
+    (start, end) of the last days / weeks of dates, ending with the day of
+    the latest date; (None, None) if there are no dates
+    """
+    latest = pd.Series(as_datetime64(dates)).max()
+    if pd.isna(latest):
+        return None, None
+    end = latest.normalize() + pd.Timedelta(days=1)
+    return end - pd.Timedelta(days=days, weeks=weeks), end
+
+
+def in_window(dates, start=None, end=None):
+    """
+    Boolean mask of the dates with start <= date < end (either bound may be
+    None); NaT is in no window
+    """
+    values = as_datetime64(dates)
+    mask = ~np.isnat(values)
+    if start is not None:
+        mask &= values >= np.datetime64(pd.Timestamp(start), "ns")
+    if end is not None:
+        mask &= values < np.datetime64(pd.Timestamp(end), "ns")
+    return mask
+
+
+class DateIndex:
+    """
+    Row positions of a frame ordered by a date column: a time range is two
+    binary searches plus the matching positions, not a scan of every row
+    """
+
+    def __init__(self, dates, factorized=None):
+        # factorized is _factorize_dates(dates) when the caller already has it
+        values = as_datetime64(dates)
+        codes, uniques = factorized or _factorize_dates(values)
+        # Sort by the time-ordered codes of the distinct dates, undated rows
+        # (NaT) last; with fewer than 65535 distinct dates the codes fit in
+        # 16 bits and the stable sort is a radix sort
+        key = np.where(codes < 0, len(uniques), codes)
+        if len(uniques) < np.iinfo(np.uint16).max:
+            key = key.astype(np.uint16)
+        order = np.argsort(key, kind="stable")
+        self.order = order[:len(order) - np.count_nonzero(codes < 0)]      # undated rows match no range
+        self.dates = values[self.order]
+
+    def positions(self, start=None, end=None):
+        """
+        Positions, in frame order, of the rows dated start <= date < end
+        (either bound may be None; bounds are anything pd.Timestamp accepts)
+        """
+        lo, hi = 0, len(self.dates)
+        if start is not None:
+            lo = np.searchsorted(self.dates, np.datetime64(pd.Timestamp(start), "ns"))
+        if end is not None:
+            hi = max(lo, np.searchsorted(self.dates, np.datetime64(pd.Timestamp(end), "ns")))
+        return np.sort(self.order[lo:hi])
+
+    def last(self, days=0, weeks=0):
+        """
+        (start, end) of the last days / weeks of data, ending with the day of
+        the latest date
+        """
+        return last_window(self.dates[-1:], days=days, weeks=weeks)
+
+    def take(self, df, start=None, end=None):
+        """
+        Rows of df dated start <= date < end
+        """
+        return df.iloc[self.positions(start, end)]
@@ -0,0 +1,173 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+# HyperLogLog sketches, one per cell, merged by register-wise max so coarser
+# cells are built from finer ones without touching rows. A cell starts
+# sparse, as a list of its set registers (cell * m + register -> rank), and
+# only gets a dense row of m registers once more than m / 8 are set, so the
+# many small cells of a fine grouping cost memory in proportion to their rows
+# rather than m bytes each.
+
+MIN_PRECISION = 4
+MAX_PRECISION = 18
+DENSE_FRACTION = 8              # a cell goes dense above m / DENSE_FRACTION set registers
+_BLOCK_REGISTERS = 1 << 20      # dense registers estimated per block
+_POWERS = np.ldexp(1.0, -np.arange(256))
+
+
+def precision_for_error(error):
+    """
+    Smallest precision p whose relative standard error 1.04 / sqrt(2**p)
+    is at most error
+    """
+    if not 0 < error < 1:
+        raise ValueError(f"HyperLogLog error bound must be between 0 and 1, got {error}")
+    p = math.ceil(math.log2((1.04 / error) ** 2))
+    return min(max(p, MIN_PRECISION), MAX_PRECISION)
+
+
+def standard_error(precision):
+    return 1.04 / math.sqrt(1 << precision)
+
+
+def hash_codes(codes):
+    """
+    64-bit hashes of factorized (integer) values
+    """
+    return pd.util.hash_array(np.asarray(codes, dtype=np.int64))
+
+
+def _bit_length(words):
+    # float64 holds 32-bit integers exactly, so frexp gives an exact bit length
+    hi = (words >> np.uint64(32)).astype(np.float64)
+    lo = (words & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    hi_len = np.frexp(hi)[1]
+    lo_len = np.frexp(lo)[1]
+    return np.where(hi_len > 0, hi_len + 32, lo_len)
+
+
+def _max_per_key(keys, ranks):
+    """
+    Distinct keys, sorted, each with its highest rank
+    """
+    if not len(keys):
+        return keys, ranks
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    return keys[starts], np.maximum.reduceat(ranks[order], starts)
+
+
+class Sketches:
+    """
+    HyperLogLog sketches of n_cells cells: sorted sparse entries
+    (cell * m + register, rank) plus dense register rows for dense_cells
+    """
+
+    def __init__(self, precision, n_cells, keys, ranks, dense_cells, dense):
+        self.precision = precision
+        self.n_cells = n_cells
+        self.keys = keys
+        self.ranks = ranks
+        self.dense_cells = dense_cells
+        self.dense = dense
+
+    @classmethod
+    def assemble(cls, precision, n_cells, keys, ranks, dense_cells=None, dense=None):
+        """
+        Sketches from distinct sorted sparse entries and dense rows (of
+        distinct sorted cells): entries of dense cells are folded into their
+        rows, and sparse cells past the threshold become dense
+        """
+        m = 1 << precision
+        if dense_cells is None:
+            dense_cells = np.zeros(0, dtype=np.int64)
+            dense = np.zeros((0, m), dtype=np.uint8)
+        cells = keys >> precision
+        registers = keys & (m - 1)
+
+        row = np.searchsorted(dense_cells, cells)
+        in_dense = row < len(dense_cells)
+        in_dense[in_dense] = dense_cells[row[in_dense]] == cells[in_dense]
+        if in_dense.any():
+            rows, cols = row[in_dense], registers[in_dense]
+            dense[rows, cols] = np.maximum(dense[rows, cols], ranks[in_dense])
+            keep = ~in_dense
+            keys, ranks, cells, registers = keys[keep], ranks[keep], cells[keep], registers[keep]
+
+        set_registers = np.bincount(cells, minlength=n_cells)
+        promoted = np.flatnonzero(set_registers > m // DENSE_FRACTION)
+        if len(promoted):
+            is_promoted = np.zeros(n_cells, dtype=bool)
+            is_promoted[promoted] = True
+            moving = is_promoted[cells]
+            new_rows = np.zeros((len(promoted), m), dtype=np.uint8)
+            new_rows[np.searchsorted(promoted, cells[moving]), registers[moving]] = ranks[moving]
+            keys, ranks = keys[~moving], ranks[~moving]
+            dense_cells = np.concatenate([dense_cells, promoted])
+            order = np.argsort(dense_cells, kind="stable")
+            dense_cells = dense_cells[order]
+            dense = np.concatenate([dense, new_rows])[order]
+        # Four-byte keys whenever every cell's registers fit
+        keys = keys.astype(np.uint32 if n_cells << precision <= 1 << 32 else np.int64)
+        return cls(precision, n_cells, keys, ranks, dense_cells, dense)
+
+
+def build_sketches(group_codes, hashes, n_groups, precision):
+    """
+    One sketch per group from row-level group codes and value hashes
+    """
+    index = (hashes >> np.uint64(64 - precision)).astype(np.int64)
+    rest = hashes << np.uint64(precision)
+    width = 64 - precision
+    # Position of the first set bit after the index bits (width + 1 if none)
+    rank = np.minimum(65 - _bit_length(rest), width + 1).astype(np.uint8)
+    keys, ranks = _max_per_key(np.asarray(group_codes, dtype=np.int64) << precision | index, rank)
+    return Sketches.assemble(precision, n_groups, keys, ranks)
+
+
+def merge_sketches(sketches, mapping, n_out):
+    """
+    Merge sketches into n_out coarser sketches; mapping[i] is the output cell
+    for cell i
+    """
+    precision = sketches.precision
+    m = 1 << precision
+    keys = sketches.keys.astype(np.int64)
+    keys, ranks = _max_per_key(mapping[keys >> precision] << precision | (keys & (m - 1)), sketches.ranks)
+    targets = mapping[sketches.dense_cells]
+    if len(targets):
+        order = np.argsort(targets, kind="stable")
+        targets = targets[order]
+        starts = np.flatnonzero(np.r_[True, targets[1:] != targets[:-1]])
+        return Sketches.assemble(precision, n_out, keys, ranks, targets[starts],
+                                 np.maximum.reduceat(sketches.dense[order], starts, axis=0))
+    return Sketches.assemble(precision, n_out, keys, ranks)
+
+
+def estimate(sketches):
+    """
+    Cardinality estimate of each sketch, with linear counting for small ranges
+    """
+    m = 1 << sketches.precision
+    n = sketches.n_cells
+    alpha = 0.7213 / (1 + 1.079 / m) if m >= 128 else {16: 0.673, 32: 0.697, 64: 0.709}[m]
+
+    # Sparse cells: registers not listed are zero and add 2**0 each
+    cells = sketches.keys >> sketches.precision
+    set_registers = np.bincount(cells, minlength=n)
+    zeros = (m - set_registers).astype(np.float64)
+    total = zeros + np.bincount(cells, weights=_POWERS[sketches.ranks], minlength=n)
+    step = max(1, _BLOCK_REGISTERS // m)
+    for start in range(0, len(sketches.dense_cells), step):
+        block = sketches.dense[start:start + step]
+        rows = sketches.dense_cells[start:start + step]
+        zeros[rows] = (block == 0).sum(axis=1)
+        total[rows] = _POWERS[block].sum(axis=1)
+
+    raw = alpha * m * m / total
+    with np.errstate(divide="ignore"):
+        linear = m * np.log(m / np.maximum(zeros, 1))
+    return np.where((raw <= 2.5 * m) & (zeros > 0), linear, raw)
@@ -0,0 +1,429 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from psa_summary import (compile_metrics, metric_columns, encode_groups, dedupe_pairs, flag_matrix,
+                         additive_weights, additive_is_integer, rollup_state)
+
+STATE_DIR = ".psa_state"
+STATE_VERSION = 2
+
+# Incremental refresh keeps, under state_dir, the merged aggregate of every
+# partition (Month) and each partition's own contribution to it. Per
+# grouping set the merged aggregate holds:
+#   - rows and additive totals per group, groups numbered stably across runs
+#   - per id column, the distinct (group, id) pairs as sorted int64 keys with
+#     the number of partitions holding each pair and, per flag, the number
+#     holding it with the flag set
+# Ids get stable dense codes from a dictionary of their 64-bit value hashes.
+# A changed partition's old contribution is subtracted and its new one added,
+# so a refresh aggregates only the changed rows; the others are only hashed
+# to find out which partitions changed.
+
+ID_SPACE = 1 << 40              # pair key = group * ID_SPACE + id code
+LARGE_DICTIONARY = 1 << 16      # categories kept hashed between runs from this size
+_MISSING_HASH = np.uint64(0x9E3779B97F4A7C15)
+_MIX = np.uint64(0x100000001B3)
+
+
+def _state_key(name, keys, metrics, grouping_sets, partition_column):
+    spec = json.dumps([name, list(keys), metrics, grouping_sets, partition_column], sort_keys=True)
+    return hashlib.sha1(spec.encode("utf-8")).hexdigest()[:16]
+
+
+# === PARTITION FINGERPRINTS ===
+
+def _dictionary_hashes(categories, target, column):
+    """
+    Hash of each category. Large text dictionaries (e.g. the ID column) are
+    hashed once and reused while their digest is unchanged.
+    """
+    values = np.asarray(categories)          # categories are never missing
+    if len(values) < LARGE_DICTIONARY or values.dtype != object:
+        return pd.util.hash_array(values, categorize=False)
+    try:
+        digest = hashlib.sha1("\x00".join(values.tolist()).encode("utf-8", "surrogatepass")).hexdigest()
+    except TypeError:
+        return pd.util.hash_array(values, categorize=False)
+    path = os.path.join(target, "dictionary-" + hashlib.sha1(column.encode("utf-8")).hexdigest()[:12] + ".pkl")
+    try:
+        stored_digest, hashes = _load_pickle(path)
+        if stored_digest == digest:
+            return hashes
+    except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+        pass
+    hashes = pd.util.hash_array(values, categorize=False)
+    _save_pickle(path, (digest, hashes))
+    return hashes
+
+
+def _column_hashes(series, target, categorize=True):
+    """
+    64-bit hash of each value; a categorical column only hashes its
+    dictionary and gathers by code
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = _dictionary_hashes(series.cat.categories, target, series.name)
+        return np.append(categories, _MISSING_HASH)[series.cat.codes.to_numpy()]
+    hashes = pd.util.hash_array(series.to_numpy(), categorize=categorize)
+    return np.where(series.isna().to_numpy(), _MISSING_HASH, hashes)
+
+
+def _partition_fingerprints(df, columns, partition_column, id_columns, target):
+    """
+    Split rows by partition_column and hash each partition's rows (in order)
+    over columns. Returns {label: (fingerprint, row positions)} and the
+    per-row value hashes of id_columns.
+    """
+    id_hashes = {}
+    row_hashes = np.zeros(len(df), dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for col in columns:
+            hashes = _column_hashes(df[col], target, categorize=col not in id_columns)
+            if col in id_columns:
+                id_hashes[col] = hashes
+            row_hashes = row_hashes * _MIX ^ hashes
+
+    codes, uniques = pd.factorize(df[partition_column], sort=True)
+    codes = np.where(codes < 0, len(uniques), codes)
+    order = np.argsort(codes.astype(np.uint16) if len(uniques) < 65535 else codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 2))
+    labels = [str(value) for value in uniques] + [""]        # missing partition value
+    partitions = {}
+    for code, label in enumerate(labels):
+        positions = order[bounds[code]:bounds[code + 1]]
+        if len(positions):
+            digest = hashlib.sha1(row_hashes[positions].tobytes()).hexdigest()
+            partitions[label] = (digest, positions)
+    return partitions, id_hashes
+
+
+# === STATE FILES ===
+
+def _save_pickle(path, value):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def _load_pickle(path):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def _n_flags(entries):
+    return len([where for _, where in entries if where is not None])
+
+
+def _empty_state(plan, grouping_sets):
+    state = {"ids": {id_column: (np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.int64))
+                     for id_column in plan["unique"]},
+             "levels": []}
+    for _ in grouping_sets:
+        state["levels"].append({
+            "labels": [], "index": {}, "rows": np.zeros(0, dtype=np.int64),
+            "additive": {name: np.zeros(0) for name, _ in plan["additive"]},
+            "pairs": {id_column: (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int32),
+                                  np.zeros((0, _n_flags(entries)), dtype=np.int32))
+                      for id_column, entries in plan["unique"].items()}})
+    return state
+
+
+def _load_state(target, plan, grouping_sets, generation):
+    try:
+        stored_generation, state = _load_pickle(os.path.join(target, "merged.pkl"))
+    except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+        return None
+    if stored_generation != generation or len(state["levels"]) != len(grouping_sets):
+        return None
+    for merged in state["levels"]:
+        merged["index"] = {label: code for code, label in enumerate(merged["labels"])}
+    return state
+
+
+def _save_state(target, state, generation):
+    levels = [{name: value for name, value in merged.items() if name != "index"} for merged in state["levels"]]
+    _save_pickle(os.path.join(target, "merged.pkl"), (generation, {"ids": state["ids"], "levels": levels}))
+
+
+# === PARTITION CONTRIBUTIONS ===
+
+def _global_groups(merged, local_labels):
+    """
+    Stable group numbers for a partition's group labels, adding new groups
+    """
+    index = merged["index"]
+    codes = []
+    for label in local_labels:
+        code = index.get(label)
+        if code is None:
+            code = len(merged["labels"])
+            index[label] = code
+            merged["labels"].append(label)
+        codes.append(code)
+    grow = len(merged["labels"]) - len(merged["rows"])
+    if grow:
+        merged["rows"] = np.append(merged["rows"], np.zeros(grow, dtype=np.int64))
+        for name, totals in merged["additive"].items():
+            merged["additive"][name] = np.append(totals, np.zeros(grow))
+    return np.asarray(codes, dtype=np.int64)
+
+
+def _id_codes(state, id_column, hashes):
+    """
+    Stable dense codes for id hashes, adding new ids to the dictionary
+    """
+    sorted_hashes, sorted_codes = state["ids"][id_column]
+    uniques, inverse = np.unique(hashes, return_inverse=True)
+    pos = np.searchsorted(sorted_hashes, uniques)
+    found = pos < len(sorted_hashes)
+    found[found] = sorted_hashes[pos[found]] == uniques[found]
+    codes = np.empty(len(uniques), dtype=np.int64)
+    codes[found] = sorted_codes[pos[found]]
+    n_new = int((~found).sum())
+    if n_new:
+        codes[~found] = np.arange(len(sorted_hashes), len(sorted_hashes) + n_new)
+        state["ids"][id_column] = (np.insert(sorted_hashes, pos[~found], uniques[~found]),
+                                   np.insert(sorted_codes, pos[~found], codes[~found]))
+    return codes[inverse]
+
+
+def _contribution(state, part, keys, plan, grouping_sets, id_hashes):
+    """
+    A partition's rows reduced to what it adds to each grouping set: rows and
+    additive totals per group, and per id column its distinct (group, id)
+    pair keys with their flags
+    """
+    fine_codes, fine_labels = encode_groups(part, keys)
+    in_group = fine_codes >= 0
+    fine_codes = fine_codes[in_group]
+    weights = {name: additive_weights(part, spec)[in_group] for name, spec in plan["additive"]}
+    ids = {}
+    for id_column, entries in plan["unique"].items():
+        id_codes = _id_codes(state, id_column, id_hashes[id_column][in_group])
+        id_codes[part[id_column].isna().to_numpy()[in_group]] = -1
+        flag_columns = [where for _, where in entries if where is not None]
+        ids[id_column] = (id_codes, flag_matrix(part, flag_columns)[in_group])
+
+    contribution = {}
+    for level, grouping_set in enumerate(grouping_sets):
+        if grouping_set:
+            fine_to_local, local_labels = encode_groups(fine_labels, grouping_set)
+            local_labels = list(local_labels.astype(object).itertuples(index=False, name=None))
+        else:
+            fine_to_local = np.zeros(len(fine_labels), dtype=np.int64)
+            local_labels = [()] if len(fine_labels) else []
+        groups = _global_groups(state["levels"][level], local_labels)
+        local_codes = fine_to_local[fine_codes]
+        contribution[f"{level}:groups"] = groups
+        contribution[f"{level}:rows"] = np.bincount(local_codes, minlength=len(groups)).astype(np.int64)
+        for name, row_weights in weights.items():
+            contribution[f"{level}:additive:{name}"] = np.bincount(local_codes, weights=row_weights,
+                                                                    minlength=len(groups))
+        row_groups = groups[local_codes]
+        for idx, (id_codes, flags) in enumerate(ids.values()):
+            # dedupe_pairs() returns pairs sorted by (group, id), so the keys are sorted
+            pair_groups, pair_ids, pair_flags = dedupe_pairs(row_groups, id_codes, flags)
+            contribution[f"{level}:pair_keys:{idx}"] = pair_groups * ID_SPACE + pair_ids
+            contribution[f"{level}:pair_flags:{idx}"] = pair_flags
+    return contribution
+
+
+def _apply(state, plan, contributions, sign):
+    """
+    Add (sign=1) or subtract (sign=-1) partitions' contributions, merging
+    their pairs into the sorted pair arrays in one pass
+    """
+    if not contributions:
+        return
+    for level, merged in enumerate(state["levels"]):
+        for contribution in contributions:
+            groups = contribution[f"{level}:groups"]
+            np.add.at(merged["rows"], groups, sign * contribution[f"{level}:rows"])
+            for name in merged["additive"]:
+                np.add.at(merged["additive"][name], groups, sign * contribution[f"{level}:additive:{name}"])
+        for idx, id_column in enumerate(plan["unique"]):
+            keys, counts, flag_counts = merged["pairs"][id_column]
+            part_keys = np.concatenate([c[f"{level}:pair_keys:{idx}"] for c in contributions])
+            part_flags = np.concatenate([c[f"{level}:pair_flags:{idx}"] for c in contributions]).astype(np.int32)
+            if len(contributions) == 1:
+                part_counts = np.ones(len(part_keys), dtype=np.int32)
+            else:
+                # The same pair in several partitions: count it once per partition
+                part_keys, inverse = np.unique(part_keys, return_inverse=True)
+                part_counts = np.bincount(inverse, minlength=len(part_keys)).astype(np.int32)
+                part_flags = np.column_stack(
+                    [np.bincount(inverse, weights=column, minlength=len(part_keys)) for column in part_flags.T]
+                ).astype(np.int32).reshape(len(part_keys), -1)
+            pos = np.searchsorted(keys, part_keys)
+            found = pos < len(keys)
+            found[found] = keys[pos[found]] == part_keys[found]
+            counts[pos[found]] += sign * part_counts[found]
+            flag_counts[pos[found]] += sign * part_flags[found]
+            if sign > 0 and not found.all():
+                missing = ~found
+                keys = np.insert(keys, pos[missing], part_keys[missing])
+                counts = np.insert(counts, pos[missing], part_counts[missing])
+                flag_counts = np.insert(flag_counts, pos[missing], part_flags[missing], axis=0)
+            merged["pairs"][id_column] = (keys, counts, flag_counts)
+
+
+def _prune_pairs(state):
+    for merged in state["levels"]:
+        for id_column, (keys, counts, flag_counts) in merged["pairs"].items():
+            keep = counts > 0
+            if not keep.all():
+                merged["pairs"][id_column] = (keys[keep], counts[keep], flag_counts[keep])
+
+
+def _finalize(state, df, keys, metrics, plan, grouping_sets):
+    """
+    Results of rollup_metrics() from the merged state
+    """
+    results = []
+    for merged, grouping_set in zip(state["levels"], grouping_sets):
+        present = np.flatnonzero(merged["rows"] > 0)
+        remap = np.full(len(merged["rows"]), -1, dtype=np.int64)
+        if grouping_set:
+            labels = pd.DataFrame([merged["labels"][code] for code in present], columns=grouping_set, dtype=object)
+            for key in grouping_set:
+                labels[key] = labels[key].astype(df[key].dtype)
+            sorted_codes, sorted_labels = encode_groups(labels, grouping_set)
+            remap[present] = sorted_codes
+            order = np.argsort(sorted_codes, kind="stable")
+        else:
+            sorted_labels = pd.DataFrame(index=pd.RangeIndex(len(present)))
+            remap[present] = 0
+            order = np.arange(len(present))
+
+        additive = {}
+        for name, spec in plan["additive"]:
+            totals = merged["additive"][name][present][order]
+            additive[name] = np.round(totals).astype(np.int64) if additive_is_integer(df, spec) else totals
+        unique = []
+        for id_column, entries in plan["unique"].items():
+            flag_columns = [where for _, where in entries if where is not None]
+            pair_keys, _, flag_counts = merged["pairs"][id_column]
+            pairs = (remap[pair_keys // ID_SPACE], pair_keys % ID_SPACE, (flag_counts > 0).astype(np.uint8))
+            unique.append((entries, flag_columns, pairs))
+        level_state = {"labels": sorted_labels, "additive": additive, "unique": unique, "sketches": None}
+        result = rollup_state(level_state, grouping_set, metrics, plan, [grouping_set])[0]
+        for key in keys:
+            if key not in grouping_set:
+                result[key] = None
+        results.append(result[keys + [col for col in result.columns if col not in keys]])
+    return results
+
+
+def refresh_summary(df, keys, metrics, grouping_sets=None, partition_column="Month",
+                    state_dir=STATE_DIR, name="summary"):
+    """
+    Incrementally refresh a metric set, one partition (e.g. Month) at a time.
+
+    The merged aggregate of all partitions and each partition's contribution
+    to it are kept under state_dir. Partitions whose rows changed, or that are
+    new or gone, have their old contribution subtracted and their new one
+    added; the rest are not aggregated again. Distinct counts stay exact:
+    per grouping set the state keeps each (group, id) pair with the number of
+    partitions that hold it. With nothing changed, the stored results are
+    returned as-is.
+
+    Returns the same value as rollup_metrics() (one frame when grouping_sets
+    is omitted) and a dict with the partitions that were recomputed, reused
+    and dropped.
+    """
+    keys = list(keys)
+    single = grouping_sets is None
+    grouping_sets = [keys] if single else [list(grouping_set) for grouping_set in grouping_sets]
+    plan = compile_metrics(metrics)
+    target = os.path.join(state_dir, _state_key(name, keys, metrics, grouping_sets, partition_column))
+    os.makedirs(target, exist_ok=True)
+    manifest_path = os.path.join(target, "manifest.json")
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+
+    used = sorted(set(keys) | metric_columns(metrics) | {partition_column})
+    used = [col for col in used if col in df.columns]
+    schema = {col: str(df[col].dtype) for col in used}
+    partitions, id_hashes = _partition_fingerprints(df, used, partition_column, set(plan["unique"]), target)
+
+    state = None
+    if manifest.get("version") == STATE_VERSION and manifest.get("schema") == schema:
+        stored = manifest["partitions"]
+        unchanged = stored.keys() == partitions.keys() and all(
+            stored[label]["fingerprint"] == fingerprint for label, (fingerprint, _) in partitions.items())
+        if unchanged:
+            try:
+                generation, results = _load_pickle(os.path.join(target, "results.pkl"))
+                if generation == manifest["generation"]:
+                    stats = {"recomputed": [], "reused": list(partitions), "dropped": []}
+                    return (results[0] if single else results), stats
+            except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+                pass
+        state = _load_state(target, plan, grouping_sets, manifest.get("generation"))
+    if state is None:
+        # No usable state: start over from every partition
+        for file_name in os.listdir(target):
+            if not file_name.startswith("dictionary-"):
+                os.remove(os.path.join(target, file_name))
+        manifest = {"partitions": {}}
+        state = _empty_state(plan, grouping_sets)
+    stored = manifest["partitions"]
+
+    stats = {"recomputed": [], "reused": [], "dropped": []}
+    new_partitions = {}
+    stale_files = []
+    for label, entry in stored.items():
+        if partitions.get(label, (None,))[0] != entry["fingerprint"]:
+            stale_files.append(entry["file"])
+            if label not in partitions:
+                stats["dropped"].append(label)
+    _apply(state, plan, [_load_pickle(os.path.join(target, file_name)) for file_name in stale_files], -1)
+
+    added = []
+
+    for label, (fingerprint, positions) in partitions.items():
+        entry = stored.get(label)
+        if entry and entry["fingerprint"] == fingerprint:
+            new_partitions[label] = entry
+            stats["reused"].append(label)
+            continue
+        contribution = _contribution(state, df.iloc[positions], keys, plan, grouping_sets,
+                                     {col: hashes[positions] for col, hashes in id_hashes.items()})
+        added.append(contribution)
+        file_name = hashlib.sha1(label.encode("utf-8")).hexdigest()[:12] + f"-{fingerprint[:12]}.pkl"
+        _save_pickle(os.path.join(target, file_name), contribution)
+        new_partitions[label] = {"fingerprint": fingerprint, "file": file_name, "rows": len(positions)}
+        stats["recomputed"].append(label)
+    _apply(state, plan, added, 1)
+    _prune_pairs(state)
+    results = _finalize(state, df, keys, metrics, plan, grouping_sets)
+
+    # The generation ties the merged state and results to this manifest, so
+    # a run that stopped half-way is detected and the state rebuilt
+    generation = uuid.uuid4().hex
+    _save_state(target, state, generation)
+    _save_pickle(os.path.join(target, "results.pkl"), (generation, results))
+    fd, tmp = tempfile.mkstemp(dir=target, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump({"version": STATE_VERSION, "generation": generation, "schema": schema,
+                   "partitions": new_partitions}, f, indent=2)
+    os.replace(tmp, manifest_path)
+    kept = {entry["file"] for entry in new_partitions.values()}
+    for file_name in stale_files:
+        if file_name not in kept:
+            try:
+                os.remove(os.path.join(target, file_name))
+            except OSError:
+                pass
+    return (results[0] if single else results), stats
@@ -0,0 +1,344 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from psa_readers import read_source, reader_name
+from psa_dates import add_date_buckets, DATE_COLUMN
+
+CACHE_DIR = ".psa_cache"
+CACHE_VERSION = 2
+
+# Columns the summary scripts work from
+SUMMARY_COLUMNS = [
+    "Affiliate",
+    "DIV_NAME",
+    "HCP Selection Request ID",
+    "Is PSA Created",
+    "PSA Activity Executed",
+    "Tag",
+    "Month",
+]
+
+# Explicit dtypes for the columns the summaries read, so chunked reads agree
+# on types no matter which rows land in which chunk
+PSA_DTYPES = {
+    "Affiliate": "str",
+    "DIV_NAME": "str",
+    "HCP Selection Request ID": "str",
+    "Tag": "str",
+    "Month": "str",
+    "Is PSA Created": "Int64",
+    "PSA Activity Executed": "Int64",
+}
+
+# Compact representation (compact=True): identifier columns and text columns
+# with at most CATEGORY_RATIO distinct values per row become categoricals
+# (integer codes plus a dictionary of the strings), 0/1 flag columns become
+# uint8. Dictionaries are sorted so groupby orders groups as it would the
+# strings, except for identifiers, which are only counted and keep
+# first-seen order (sorting millions of ids costs more than the rest).
+ID_COLUMNS = ["HCP Selection Request ID"]
+FLAG_COLUMNS = ["Is PSA Created", "PSA Activity Executed", "Is Resubmitted"]
+CATEGORY_RATIO = 0.5
+
+
+def file_sha256(path, block_size=1 << 20):
+    """
+    SHA-256 of a file's content, read in blocks
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _cache_path(path, cache_dir, sheet=None):
+    # In the working directory, like .psa_state and .psa_build: the source
+    # may sit on a read-only share
+    if cache_dir is None:
+        cache_dir = CACHE_DIR
+    name = os.path.abspath(path) if sheet is None else f"{os.path.abspath(path)}\0{sheet}"
+    key = hashlib.sha1(name.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_dir, key)
+
+
+def _is_text(series):
+    if isinstance(series.dtype, pd.StringDtype):
+        return True
+    if not pd.api.types.is_object_dtype(series):
+        return False
+    return all(isinstance(value, str) for value in series.dropna().unique())
+
+
+def _write_cache(df, target, source_info):
+    """
+    Write a DataFrame as one .npy file per column: numbers as-is, text as
+    int32 dictionary codes plus a fixed-width unicode dictionary, so both
+    can be memory-mapped back. Mixed-type columns fall back to pickled
+    object arrays.
+    """
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=os.path.dirname(target))
+    try:
+        _write_columns(df, tmp, source_info)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    if os.path.exists(target):
+        shutil.rmtree(target)
+    os.replace(tmp, target)
+
+
+def _write_columns(df, tmp, source_info):
+    columns = []
+    for idx, name in enumerate(df.columns):
+        series = df[name]
+        entry = {"name": name, "file": f"col_{idx:03d}", "dtype": str(series.dtype)}
+        if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+            entry["kind"] = "numeric"
+            np.save(os.path.join(tmp, entry["file"] + ".npy"), series.to_numpy())
+        elif _is_text(series):
+            entry["kind"] = "dict"
+            codes, uniques = pd.factorize(series)
+            categories = np.array(list(uniques), dtype=str) if len(uniques) else np.array([], dtype="U1")
+            np.save(os.path.join(tmp, entry["file"] + ".codes.npy"), codes.astype(np.int32))
+            np.save(os.path.join(tmp, entry["file"] + ".categories.npy"), categories)
+        else:
+            entry["kind"] = "object"
+            np.save(os.path.join(tmp, entry["file"] + ".npy"), series.to_numpy(dtype=object),
+                    allow_pickle=True)
+        columns.append(entry)
+
+    manifest = dict(source_info, version=CACHE_VERSION, rows=len(df), columns=columns)
+    with open(os.path.join(tmp, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def _read_manifest(target):
+    try:
+        with open(os.path.join(target, "manifest.json"), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != CACHE_VERSION:
+        return None
+    return manifest
+
+
+def _sorted_categorical(codes, categories):
+    """
+    Categorical from factorize-order codes, with the dictionary sorted so
+    groupby on it orders groups like the plain strings
+    """
+    order = np.argsort(categories, kind="stable")
+    remap = np.empty(len(order) + 1, dtype=np.int32)
+    remap[order] = np.arange(len(order), dtype=np.int32)
+    remap[-1] = -1                  # missing values (code -1) stay missing
+    return pd.Categorical.from_codes(remap[codes], np.asarray(categories, dtype=object)[order])
+
+
+def _load_column(target, entry, compact=False):
+    base = os.path.join(target, entry["file"])
+    if entry["kind"] == "numeric":
+        series = pd.Series(np.load(base + ".npy", mmap_mode="r"), name=entry["name"])
+        return _compact_flag(series) if compact else series
+    if entry["kind"] == "dict":
+        codes = np.load(base + ".codes.npy", mmap_mode="r")
+        categories = np.load(base + ".categories.npy", mmap_mode="r")
+        if compact and entry["name"] in ID_COLUMNS:
+            return pd.Series(pd.Categorical.from_codes(codes, categories.astype(object)), name=entry["name"])
+        if compact and _wants_category(entry["name"], len(categories), len(codes)):
+            return pd.Series(_sorted_categorical(codes, categories), name=entry["name"])
+        values = pd.Categorical.from_codes(codes, categories.astype(object))
+        return pd.Series(values, name=entry["name"]).astype(entry["dtype"])
+    return pd.Series(np.load(base + ".npy", allow_pickle=True), name=entry["name"])
+
+
+def _load_cached(target, manifest, columns, compact=False):
+    entries = manifest["columns"]
+    if columns is not None:
+        wanted = set(columns)
+        entries = [entry for entry in entries if entry["name"] in wanted]
+    if not entries:
+        return pd.DataFrame(index=pd.RangeIndex(manifest["rows"]))
+    return pd.concat([_load_column(target, entry, compact) for entry in entries], axis=1)
+
+
+def _wants_category(name, n_distinct, n_rows):
+    return name in ID_COLUMNS or n_distinct <= CATEGORY_RATIO * n_rows
+
+
+def _compact_flag(series):
+    """
+    0/1 flag columns as uint8 (nullable UInt8 when values are missing);
+    anything else is returned unchanged
+    """
+    if series.name not in FLAG_COLUMNS or not pd.api.types.is_numeric_dtype(series):
+        return series
+    values = series.dropna()
+    if not values.isin([0, 1]).all():
+        return series
+    return series.astype("uint8" if len(values) == len(series) else "UInt8")
+
+
+def compact_psa_frame(df):
+    """
+    Convert a loaded PSA DataFrame to the compact representation: categorical
+    identifier and low-cardinality text columns, uint8 flags. Values, and the
+    order groupby puts them in, are unchanged.
+    """
+    columns = {}
+    for name in df.columns:
+        series = df[name]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            columns[name] = series
+        elif _is_text(series):
+            codes, uniques = pd.factorize(series, sort=name not in ID_COLUMNS)
+            if _wants_category(name, len(uniques), len(series)):
+                series = pd.Series(pd.Categorical.from_codes(codes, uniques), index=df.index, name=name)
+            columns[name] = series
+        else:
+            columns[name] = _compact_flag(series)
+    return pd.DataFrame(columns, index=df.index)
+
+
+def _covers(manifest, columns):
+    """
+    Whether a cache holds every requested column the source has
+    """
+    if manifest.get("complete"):
+        return True
+    if columns is None:
+        return False
+    cached = {entry["name"] for entry in manifest["columns"]}
+    available = set(manifest["source_columns"])
+    return all(col in cached for col in columns if col in available)
+
+
+def _record_load(stats, reader, df, start, size):
+    if stats is None:
+        return
+    seconds = time.perf_counter() - start
+    stats.update(reader=reader, rows=len(df), columns=len(df.columns), seconds=seconds,
+                 rows_per_second=len(df) / seconds if seconds > 0 else None,
+                 mb_per_second=size / (1 << 20) / seconds if seconds > 0 else None)
+
+
+def describe_load(stats):
+    """
+    One-line summary of the load throughput recorded by load_psa_data
+    """
+    rate = "" if stats["rows_per_second"] is None else f" ({stats['rows_per_second']:,.0f} rows/s"
+    if rate and stats["reader"] != "cache":
+        rate += f", {stats['mb_per_second']:.1f} MB/s"
+    return (f"{stats['rows']:,} rows × {stats['columns']} columns via {stats['reader']} "
+            f"in {stats['seconds']:.2f}s{rate}{')' if rate else ''}")
+
+
+def _with_dates(df):
+    return add_date_buckets(df) if DATE_COLUMN in df.columns else df
+
+
+def load_psa_data(path, columns=None, use_cache=True, cache_dir=None, compact=False, sheet=None, stats=None,
+                  dates=False):
+    """
+    Load a PSA source file (CSV, xlsx/xlsm, xlsb or xls) as a DataFrame.
+
+    The source is parsed by the reader registered for its extension in
+    psa_readers, which only parses the requested columns. Parsed columns go
+    into a columnar cache keyed by the source's path, size, mtime and
+    SHA-256, kept under .psa_cache/ in the working directory (or
+    cache_dir); later loads memory-map the cache, and a load asking for columns
+    the cache lacks re-parses those together with the cached ones. A source
+    whose mtime changed but whose content hash did not is still served from
+    the cache. Requested columns missing from the source are left out rather
+    than raising, so callers can report them. When the cache cannot be
+    written (read-only or full disk) the source is still loaded, uncached.
+
+    sheet picks the Excel sheet (name or 0-based index, default the first).
+    Pass a dict as stats to receive the reader used, rows, seconds and
+    throughput (see describe_load).
+
+    With compact=True the frame uses the compact representation of
+    compact_psa_frame(); from the cache, dictionary-encoded columns are
+    handed over as categoricals without rebuilding the strings.
+
+    With dates=True the Created Date serials are returned as datetime64 with
+    ordered Created Month / Week / Quarter buckets next to them (see
+    psa_dates.add_date_buckets); Created Date is loaded even if columns
+    leaves it out.
+    """
+    start = time.perf_counter()
+    if dates and columns is not None and DATE_COLUMN not in columns:
+        columns = list(columns) + [DATE_COLUMN]
+    stat = os.stat(path)
+    if not use_cache:
+        df, _ = read_source(path, columns, sheet)
+        df = compact_psa_frame(df) if compact else df
+        df = _with_dates(df) if dates else df
+        _record_load(stats, reader_name(path), df, start, stat.st_size)
+        return df
+
+    target = _cache_path(path, cache_dir, sheet)
+    manifest = _read_manifest(target)
+    sha256 = None
+    fresh = False
+    if manifest is not None and manifest["size"] == stat.st_size:
+        if manifest["mtime_ns"] == stat.st_mtime_ns:
+            fresh = True
+        else:
+            sha256 = file_sha256(path)
+            if manifest["sha256"] == sha256:
+                fresh = True
+                manifest["mtime_ns"] = stat.st_mtime_ns
+                try:
+                    with open(os.path.join(target, "manifest.json"), "w", encoding="utf-8") as f:
+                        json.dump(manifest, f, indent=2)
+                except OSError:
+                    pass            # re-hashed next time instead
+    if fresh and _covers(manifest, columns):
+        df = _load_cached(target, manifest, columns, compact)
+        df = _with_dates(df) if dates else df
+        _record_load(stats, "cache", df, start, stat.st_size)
+        return df
+
+    read_columns = columns
+    if fresh and columns is not None:
+        # Keep what is already cached so alternating callers do not evict
+        # each other's columns
+        read_columns = list(dict.fromkeys([entry["name"] for entry in manifest["columns"]] + list(columns)))
+    df, source_columns = read_source(path, read_columns, sheet)
+    source_info = {
+        "source": os.path.abspath(path),
+        "sheet": sheet,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": sha256 or file_sha256(path),
+        "source_columns": source_columns,
+        "complete": read_columns is None,
+    }
+    try:
+        _write_cache(df, target, source_info)
+    except OSError:
+        pass                        # no cache this time; the load itself succeeded
+    df = df if columns is None else df[[col for col in columns if col in df.columns]]
+    df = compact_psa_frame(df) if compact else df
+    df = _with_dates(df) if dates else df
+    _record_load(stats, reader_name(path), df, start, stat.st_size)
+    return df
+
+
+def iter_csv_chunks(path, columns=None, chunksize=100000):
+    """
+    Read a PSA CSV chunksize rows at a time, parsing only the given columns
+    (all when None) with the dtypes from PSA_DTYPES
+    """
+    dtype = {col: kind for col, kind in PSA_DTYPES.items() if columns is None or col in columns}
+    return pd.read_csv(path, usecols=columns, dtype=dtype, chunksize=chunksize)
@@ -0,0 +1,261 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+import psa_trace
+from psa_summary import (compile_metrics, additive_is_integer, additive_weights, dedupe_pairs,
+                         flag_matrix, rollup_state)
+
+# Parallel fine-level aggregation. The parent places the columns the metrics
+# read in shared memory as integer codes or numeric arrays (a categorical
+# column's own codes, so a compact frame is shipped without re-encoding) and
+# splits the groups into contiguous ranges of the leading keys, balanced by
+# row count. The parent sorts the row positions by range once (a stable sort
+# of small range numbers, i.e. a radix sort) and shares them, so each worker
+# reads only its own slice of positions and touches only its own rows. Every
+# group, and every (group, id) pair, is aggregated by exactly one worker: the
+# parent only concatenates the small NumPy arrays they return, in order, and
+# never deduplicates pairs again. No DataFrame is pickled.
+
+PREFIX_CELLS = 1 << 20          # largest leading-key space used to split the groups
+
+
+def pool_context():
+    """
+    Multiprocessing context for the process pools: fork where available, as
+    forked workers do not re-import the calling script, which matters for
+    flat scripts such as fdrf.py that have no __main__ guard
+    """
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context()
+
+
+def _share(array, blocks):
+    """
+    Copy an array into a new shared memory block and return its descriptor
+    """
+    array = np.ascontiguousarray(array)
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    blocks.append(shm)
+    return shm.name, array.shape, array.dtype.str
+
+
+def _attach(descriptor, handles):
+    name, shape, dtype = descriptor
+    # Pool workers share the parent's resource tracker, so attaching here
+    # does not hand ownership of the block to the worker
+    shm = shared_memory.SharedMemory(name=name)
+    handles.append(shm)
+    return np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+def _aggregate_range(task):
+    """
+    Worker: aggregate the rows at positions[start:stop], the rows of one
+    range of leading-key prefixes
+    """
+    handles = []
+    try:
+        return _aggregate(task, handles)
+    finally:
+        for shm in handles:
+            try:
+                shm.close()
+            except BufferError:
+                pass
+
+
+def _weights(source, rows, handles):
+    kind, block = source
+    values = _attach(block, handles)[rows]
+    if kind == "present":
+        return (values >= 0).astype(np.float64)
+    values = values.astype(np.float64)
+    if kind == "count":
+        return (~np.isnan(values)).astype(np.float64)
+    return np.nan_to_num(values, nan=0.0)
+
+
+def _aggregate(task, handles):
+    start, stop, positions_block, dims, key_blocks, weight_sources, unique_blocks = task
+    rows = _attach(positions_block, handles)[start:stop]
+    group_codes = np.ravel_multi_index(tuple(_attach(block, handles)[rows].astype(np.int64)
+                                             for block in key_blocks), dims)
+    groups, local = np.unique(group_codes, return_inverse=True)
+    totals = [np.bincount(local, weights=_weights(source, rows, handles), minlength=len(groups))
+              for source in weight_sources]
+
+    pairs = []
+    for id_block, flag_blocks in unique_blocks:
+        id_codes = _attach(id_block, handles)[rows].astype(np.int64)
+        flags = np.zeros((len(rows), len(flag_blocks)), dtype=np.uint8)
+        for idx, block in enumerate(flag_blocks):
+            flags[:, idx] = _attach(block, handles)[rows] == 1
+        pairs.append(dedupe_pairs(local, id_codes, flags))
+    return groups, totals, pairs
+
+
+def _encode(series, sort=True):
+    """
+    Integer codes (-1 for missing) and the values they stand for. A
+    categorical column's own codes are used as they are.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        values = pd.Categorical.from_codes(np.arange(len(series.cat.categories)), dtype=series.dtype)
+        return series.cat.codes.to_numpy(), values
+    return pd.factorize(series, sort=sort)
+
+
+def _numeric(series):
+    """
+    A flag or additive column as a NumPy numeric array (NaN for missing), or
+    None when it is not numeric
+    """
+    if series.dtype.kind in "biuf":
+        return series.to_numpy()
+    try:
+        return series.to_numpy(dtype=np.float64, na_value=np.nan)
+    except (TypeError, ValueError):
+        return None
+
+
+def _weight_source(df, spec, blocks):
+    column = df[spec["column"]]
+    if spec["type"] == "count" and isinstance(column.dtype, pd.CategoricalDtype):
+        return "present", _share(column.cat.codes.to_numpy(), blocks)
+    values = _numeric(column)
+    if values is None:
+        return "sum", _share(additive_weights(df, spec), blocks)
+    return spec["type"], _share(values, blocks)
+
+
+def _flag_block(df, column, blocks):
+    values = _numeric(df[column])
+    return _share(values if values is not None else flag_matrix(df, [column])[:, 0], blocks)
+
+
+def _split_prefixes(prefix_counts, workers):
+    """
+    Contiguous prefix ranges [low, high) with about the same number of rows
+    """
+    before = np.cumsum(prefix_counts) - prefix_counts
+    owner = np.minimum(before * workers // max(int(prefix_counts.sum()), 1), workers - 1)
+    starts = np.searchsorted(owner, np.arange(workers + 1))
+    return [(int(starts[i]), int(starts[i + 1])) for i in range(workers) if starts[i + 1] > starts[i]]
+
+
+def parallel_fine_state(df, keys, plan, workers=None):
+    """
+    Build the same fine-level state as psa_summary.fine_state() using a
+    process pool, each worker aggregating a disjoint set of groups
+    """
+    workers = workers or os.cpu_count() or 1
+    if not keys:
+        workers = 1             # one group: it cannot be split
+    blocks = []
+    try:
+        with psa_trace.stage("parallel_encode", rows=len(df)):
+            key_codes, key_values = [], []
+            for key in keys or [None]:
+                codes, values = _encode(df[key]) if key else (np.zeros(len(df), dtype=np.int8), [None])
+                key_codes.append(codes)
+                key_values.append(values)
+            dims = tuple(max(len(values), 1) for values in key_values)
+            if float(np.prod(dims, dtype=np.float64)) >= 2 ** 62:
+                raise ValueError("Too many key combinations for parallel aggregation; use workers=1")
+            key_blocks = [_share(codes, blocks) for codes in key_codes]
+
+            # Rows per combination of the leading keys (as many as keep that
+            # space small), to split the groups into balanced ranges
+            n_prefix = 1
+            while n_prefix < len(dims) and np.prod(dims[:n_prefix + 1], dtype=np.float64) <= PREFIX_CELLS:
+                n_prefix += 1
+            prefix = np.zeros(len(df), dtype=np.int64)
+            valid = np.ones(len(df), dtype=bool)
+            for codes in key_codes:
+                valid &= codes >= 0
+            for codes, dim in zip(key_codes[:n_prefix], dims):
+                prefix = prefix * dim + codes
+            prefix_counts = np.bincount(prefix[valid], minlength=int(np.prod(dims[:n_prefix])))
+
+            # Row positions grouped by the range that owns them (rows with a
+            # missing key last, in no range), each range's rows in frame order
+            ranges = _split_prefixes(prefix_counts, workers)
+            owner = np.searchsorted([high for _, high in ranges], prefix, side="right")
+            owner[~valid] = len(ranges)
+            owner = owner.astype(np.uint8 if len(ranges) < 255 else np.int64)
+            positions = np.argsort(owner, kind="stable")
+            positions = positions.astype(np.int32 if len(df) < 2 ** 31 else np.int64)
+            bounds = np.concatenate([[0], np.cumsum(np.bincount(owner, minlength=len(ranges) + 1))])
+            positions_block = _share(positions, blocks)
+
+            weight_sources = [_weight_source(df, spec, blocks) for _, spec in plan["additive"]]
+            unique_blocks, unique_entries = [], []
+            for id_column, entries in plan["unique"].items():
+                flag_columns = [where for _, where in entries if where is not None]
+                unique_blocks.append((_share(_encode(df[id_column], sort=False)[0], blocks),
+                                      [_flag_block(df, column, blocks) for column in flag_columns]))
+                unique_entries.append((entries, flag_columns))
+
+        with psa_trace.stage("parallel_workers", rows=len(df)):
+            tasks = [(int(bounds[i]), int(bounds[i + 1]), positions_block, dims, key_blocks, weight_sources,
+                      unique_blocks) for i in range(len(ranges))]
+            with ProcessPoolExecutor(max_workers=len(tasks) or 1, mp_context=pool_context()) as pool:
+                parts = list(pool.map(_aggregate_range, tasks))
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+    with psa_trace.stage("parallel_merge"):
+        # Workers own increasing prefix ranges and return their groups sorted,
+        # so the concatenation is in groupby(sort=True) order, and no group
+        # (hence no pair) comes from two workers
+        present = np.concatenate([groups for groups, _, _ in parts]) if parts else np.zeros(0, np.int64)
+        offsets = np.cumsum([0] + [len(groups) for groups, _, _ in parts])
+
+        additive = {}
+        for idx, (name, spec) in enumerate(plan["additive"]):
+            totals = np.concatenate([part_totals[idx] for _, part_totals, _ in parts]) if parts \
+                else np.zeros(0)
+            additive[name] = totals.astype(np.int64) if additive_is_integer(df, spec) else totals
+
+        unique = []
+        for idx, (entries, flag_columns) in enumerate(unique_entries):
+            if parts:
+                pair_groups = np.concatenate([pairs[idx][0] + offset
+                                              for (_, _, pairs), offset in zip(parts, offsets)])
+                pair_ids = np.concatenate([pairs[idx][1] for _, _, pairs in parts])
+                pair_flags = np.concatenate([pairs[idx][2] for _, _, pairs in parts])
+            else:
+                pair_groups, pair_ids = np.zeros(0, np.int64), np.zeros(0, np.int64)
+                pair_flags = np.zeros((0, len(flag_columns)), np.uint8)
+            unique.append((entries, flag_columns, (pair_groups, pair_ids, pair_flags)))
+
+        positions = np.unravel_index(present, dims) if keys else ()
+        labels = pd.DataFrame({key: key_values[idx].take(positions[idx]) for idx, key in enumerate(keys)})
+    return {"labels": labels, "additive": additive, "unique": unique, "sketches": None}
+
+
+def parallel_rollup_metrics(df, keys, metrics, grouping_sets, workers=None):
+    """
+    rollup_metrics() with the row-level aggregation spread over a process
+    pool; results are identical to the serial engine
+    """
+    plan = compile_metrics(metrics)
+    keys = list(keys)
+    state = parallel_fine_state(df, keys, plan, workers)
+    return rollup_state(state, keys, metrics, plan, grouping_sets)
+
+
+def parallel_compute_metrics(df, keys, metrics, workers=None):
+    """
+    compute_metrics() on a process pool
+    """
+    return parallel_rollup_metrics(df, keys, metrics, [keys], workers)[0]
@@ -0,0 +1,409 @@
+import os
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from xml.parsers import expat
+
+import pandas as pd
+from pandas.io.parsers import TextParser
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format
+from openpyxl.utils.datetime import from_excel, CALENDAR_WINDOWS_1900, CALENDAR_MAC_1904
+
+try:
+    import python_calamine      # optional: Rust reader for xlsx/xlsb, used by pandas as engine="calamine"
+except ImportError:
+    python_calamine = None
+
+try:
+    import pyxlsb               # optional: pure-Python xlsb reader
+except ImportError:
+    pyxlsb = None
+
+# Source file readers, chosen by extension. Each takes (path, columns, sheet)
+# and returns (DataFrame of the requested columns, every column name in the
+# source), so only the columns a script needs are parsed. Columns are picked
+# by header name; requested columns the source lacks are left out. Excel
+# rows go through pandas' TextParser, the step pd.read_excel ends with, so
+# dtypes and missing values come out as they would from pd.read_excel.
+#
+#   .csv             pd.read_csv with usecols
+#   .xlsx / .xlsm    calamine when installed, else a streaming expat parser of
+#                    the sheet XML (no cell objects are built)
+#   .xlsb            calamine when installed, else pyxlsb (dates then stay Excel
+#                    serial numbers, pyxlsb does not read cell formats)
+#   .xls             pd.read_excel
+#
+# register_reader() adds or replaces a reader for an extension.
+
+_MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_PKG_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+
+def _frame_from_rows(rows, columns):
+    """
+    DataFrame from sheet rows (header first) as pd.read_excel would build it,
+    keeping only the requested columns; returns (frame, source columns)
+    """
+    header = [str(name) for name in rows[0]] if rows else []
+    if columns is None:
+        keep = list(range(max((len(row) for row in rows), default=0)))
+    else:
+        wanted = set(columns)
+        keep = [idx for idx, name in enumerate(header) if name in wanted]
+    if not keep:
+        return pd.DataFrame(index=pd.RangeIndex(max(len(rows) - 1, 0))), header
+    data = [[(row[idx] if idx < len(row) else "") for idx in keep] for row in rows]
+    frame = TextParser(data, header=0, skip_blank_lines=False).read()
+    return frame, header
+
+
+def _excel_value(value):
+    # pd.read_excel's openpyxl conversion: integral numbers as int
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+# ========== XLSX (streaming) ==========
+
+def _column_index(ref):
+    """
+    0-based column of a cell reference such as "AB12"
+    """
+    idx = 0
+    for ch in ref:
+        if "A" <= ch <= "Z":
+            idx = idx * 26 + ord(ch) - 64
+        else:
+            break
+    return idx - 1
+
+
+def _package_path(base, target):
+    if target.startswith("/"):
+        return target.lstrip("/")
+    return posixpath.normpath(posixpath.join(posixpath.dirname(base), target))
+
+
+def _workbook_parts(archive, sheet):
+    """
+    Zip paths of the requested sheet (name, index or None for the first),
+    the shared strings and the styles, plus the workbook's date epoch
+    """
+    workbook = ET.fromstring(archive.read("xl/workbook.xml"))
+    rels = ET.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+    targets = {rel.get("Id"): (rel.get("Type", ""), _package_path("xl/workbook.xml", rel.get("Target")))
+               for rel in rels.iter(f"{_PKG_REL_NS}Relationship")}
+
+    sheets = [(element.get("name"), element.get(f"{_REL_NS}id"))
+              for element in workbook.iter(f"{_MAIN_NS}sheet")]
+    if sheet is None:
+        sheet = 0
+    if isinstance(sheet, int):
+        if not 0 <= sheet < len(sheets):
+            raise ValueError(f"Worksheet index {sheet} is invalid, {len(sheets)} worksheets found")
+        rel_id = sheets[sheet][1]
+    else:
+        matches = [rel_id for name, rel_id in sheets if name == sheet]
+        if not matches:
+            raise ValueError(f"Worksheet named '{sheet}' not found")
+        rel_id = matches[0]
+
+    def part(kind):
+        return next((path for rel_type, path in targets.values() if rel_type.endswith("/" + kind)), None)
+
+    properties = workbook.find(f"{_MAIN_NS}workbookPr")
+    date1904 = properties is not None and properties.get("date1904") in ("1", "true")
+    return targets[rel_id][1], part("sharedStrings"), part("styles"), \
+        CALENDAR_MAC_1904 if date1904 else CALENDAR_WINDOWS_1900
+
+
+def _shared_strings(archive, path):
+    if path is None or path not in archive.namelist():
+        return []
+    strings, parts = [], []
+    state = {"text": False, "phonetic": 0}
+
+    def start(name, attrs):
+        if name == "si":
+            parts.clear()
+        elif name == "t":
+            state["text"] = True
+        elif name == "rPh":
+            state["phonetic"] += 1      # phonetic guides are not part of the text
+
+    def end(name):
+        if name == "si":
+            strings.append("".join(parts))
+        elif name == "t":
+            state["text"] = False
+        elif name == "rPh":
+            state["phonetic"] -= 1
+
+    def text(data):
+        if state["text"] and not state["phonetic"]:
+            parts.append(data)
+
+    parser = expat.ParserCreate()
+    parser.buffer_text = True
+    parser.StartElementHandler, parser.EndElementHandler, parser.CharacterDataHandler = start, end, text
+    with archive.open(path) as f:
+        parser.ParseFile(f)
+    return strings
+
+
+def _date_styles(archive, path):
+    """
+    Indexes of the cell formats that display numbers as dates
+    """
+    if path is None or path not in archive.namelist():
+        return set()
+    styles = ET.fromstring(archive.read(path))
+    custom = {int(fmt.get("numFmtId")): fmt.get("formatCode") for fmt in styles.iter(f"{_MAIN_NS}numFmt")}
+    cell_formats = styles.find(f"{_MAIN_NS}cellXfs")
+    if cell_formats is None:
+        return set()
+    dates = set()
+    for idx, xf in enumerate(cell_formats.iter(f"{_MAIN_NS}xf")):
+        fmt_id = int(xf.get("numFmtId", 0))
+        code = custom.get(fmt_id, BUILTIN_FORMATS.get(fmt_id))
+        if code is not None and is_date_format(code):
+            dates.add(idx)
+    return dates
+
+
+def _cell_value(text, kind, date, strings, epoch):
+    """
+    Value of a cell from its <v> text, converted as pd.read_excel would
+    """
+    if kind == "s":
+        return strings[int(text)]
+    if kind == "n":
+        number = float(text)
+        if date:
+            return from_excel(number, epoch)
+        return _excel_value(number)
+    if kind == "b":
+        return bool(int(text))
+    if kind == "e":
+        return float("nan")
+    if kind == "d":
+        return datetime.fromisoformat(text.rstrip("Z"))
+    return text                         # "str" (formula result) and "inlineStr"
+
+
+def _sheet_rows(archive, path, strings, date_styles, epoch, columns=None):
+    """
+    Stream a worksheet's XML into (header, rows) without building cell
+    objects. With columns, only cells under those headers are converted and
+    rows hold just those columns, in sheet order; otherwise rows are full.
+    Rows match what pd.read_excel gets from openpyxl: empty cells are "" and
+    trailing empty rows are dropped.
+    """
+    header = None
+    keep = None             # column index -> position in a projected row
+    rows = []
+    row = []
+    last_filled = -1
+    filled = False
+    next_row = next_col = 0
+    col = 0
+    kind, date, wanted = "n", False, True
+    text = None             # pieces of the current cell's <v> / inline <t>
+    collecting = False
+    letters_to_index = {}
+
+    def set_header(values):
+        nonlocal header, keep
+        header = [str(value) for value in values]
+        if columns is not None:
+            wanted_names = set(columns)
+            keep = {idx: pos for pos, idx in
+                    enumerate(idx for idx, value in enumerate(header) if value in wanted_names)}
+
+    def start(name, attrs):
+        nonlocal col, kind, date, wanted, text, collecting, filled, next_row, next_col, row
+        if name == "c":
+            ref = attrs.get("r")
+            if ref:
+                letters = ref.rstrip("0123456789")
+                col = letters_to_index.get(letters)
+                if col is None:
+                    col = letters_to_index[letters] = _column_index(letters)
+            else:
+                col = next_col
+            next_col = col + 1
+            wanted = keep is None or col in keep
+            if wanted:
+                kind = attrs.get("t", "n")
+                style = attrs.get("s")
+                date = style is not None and int(style) in date_styles
+            text = None
+        elif name == "v" or name == "t":
+            if wanted:
+                collecting = True
+                if text is None:
+                    text = []
+            else:
+                filled = True           # a value in a column that is not read
+        elif name == "row":
+            ref = attrs.get("r")
+            number = int(ref) - 1 if ref else next_row
+            if header is None and number > 0:
+                set_header([])          # sheet row 1 is the header even when it is blank
+            while len(rows) + (header is not None) < number:
+                rows.append([] if keep is None else [""] * len(keep))     # rows missing from the XML
+            next_row = number + 1
+            next_col = 0
+            filled = False
+            row = [] if keep is None or header is None else [""] * len(keep)
+
+    def end(name):
+        nonlocal collecting, filled, last_filled
+        if name == "v" or name == "t":
+            collecting = False
+        elif name == "c":
+            if not wanted or text is None:
+                return
+            value = _cell_value("".join(text), kind, date, strings, epoch)
+            if value != "":
+                filled = True
+            if keep is None or header is None:
+                while len(row) < col:
+                    row.append("")
+                row.append(value)
+            else:
+                row[keep[col]] = value
+        elif name == "row":
+            if header is None:
+                set_header(row)
+                return
+            if keep is None:
+                while row and row[-1] == "":
+                    row.pop()
+            rows.append(row)
+            if filled:
+                last_filled = len(rows) - 1
+
+    def add_text(data):
+        if collecting:
+            text.append(data)
+
+    parser = expat.ParserCreate()
+    parser.buffer_text = True
+    parser.StartElementHandler, parser.EndElementHandler, parser.CharacterDataHandler = start, end, add_text
+    with archive.open(path) as f:
+        parser.ParseFile(f)
+    return header or [], keep, rows[:last_filled + 1]
+
+
+def _read_xlsx_streaming(path, columns=None, sheet=None):
+    with zipfile.ZipFile(path) as archive:
+        sheet_path, strings_path, styles_path, epoch = _workbook_parts(archive, sheet)
+        header, keep, rows = _sheet_rows(archive, sheet_path, _shared_strings(archive, strings_path),
+                                         _date_styles(archive, styles_path), epoch, columns)
+    if keep is None:
+        return _frame_from_rows([header] + rows, columns)
+    if not keep:
+        return pd.DataFrame(index=pd.RangeIndex(len(rows))), header
+    names = [header[idx] for idx in sorted(keep)]
+    return TextParser([names] + rows, header=0, skip_blank_lines=False).read(), header
+
+
+# ========== Other formats ==========
+
+def _read_calamine(path, columns=None, sheet=None):
+    header = []
+
+    def keep(name):
+        header.append(str(name))
+        return columns is None or name in columns
+
+    frame = pd.read_excel(path, sheet_name=0 if sheet is None else sheet, engine="calamine", usecols=keep)
+    return frame, header
+
+
+def _read_xlsb_pyxlsb(path, columns=None, sheet=None):
+    rows = []
+    with pyxlsb.open_workbook(path) as workbook:
+        with workbook.get_sheet(1 if sheet is None else sheet + 1 if isinstance(sheet, int) else sheet) as ws:
+            for row in ws.rows(sparse=True):
+                if not row:
+                    continue
+                while len(rows) < row[0].r:
+                    rows.append([])
+                values = [""] * (max(cell.c for cell in row) + 1)
+                for cell in row:
+                    if cell.v is not None:
+                        values[cell.c] = _excel_value(cell.v)
+                rows.append(values)
+    return _frame_from_rows(rows, columns)
+
+
+def read_csv_source(path, columns=None, sheet=None):
+    header = list(pd.read_csv(path, nrows=0).columns)
+    if columns is None:
+        return pd.read_csv(path), header
+    wanted = set(columns)
+    return pd.read_csv(path, usecols=lambda name: name in wanted), header
+
+
+def read_xlsx_source(path, columns=None, sheet=None):
+    if python_calamine is not None:
+        return _read_calamine(path, columns, sheet)
+    return _read_xlsx_streaming(path, columns, sheet)
+
+
+def read_xlsb_source(path, columns=None, sheet=None):
+    if python_calamine is not None:
+        return _read_calamine(path, columns, sheet)
+    if pyxlsb is not None:
+        return _read_xlsb_pyxlsb(path, columns, sheet)
+    raise ImportError("Reading .xlsb files needs python-calamine or pyxlsb: pip install python-calamine")
+
+
+def read_xls_source(path, columns=None, sheet=None):
+    frame = pd.read_excel(path, sheet_name=0 if sheet is None else sheet)
+    header = [str(name) for name in frame.columns]
+    if columns is not None:
+        frame = frame[[col for col in frame.columns if col in set(columns)]]
+    return frame, header
+
+
+READERS = {
+    ".csv": read_csv_source,
+    ".xlsx": read_xlsx_source,
+    ".xlsm": read_xlsx_source,
+    ".xlsb": read_xlsb_source,
+    ".xls": read_xls_source,
+}
+
+
+def register_reader(extension, reader):
+    """
+    Use reader(path, columns, sheet) -> (frame, source columns) for files
+    with the given extension
+    """
+    READERS[extension.lower()] = reader
+
+
+def reader_name(path):
+    """
+    Short description of the reader read_source would use for path
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".xlsx", ".xlsm", ".xlsb") and python_calamine is not None:
+        return "calamine"
+    return {".csv": "csv", ".xlsx": "xlsx streaming", ".xlsm": "xlsx streaming", ".xlsb": "pyxlsb",
+            ".xls": "pandas"}.get(extension, getattr(READERS.get(extension), "__name__", "csv"))
+
+
+def read_source(path, columns=None, sheet=None):
+    """
+    Parse a source file with the reader registered for its extension (CSV
+    for unknown ones). Returns (frame, source columns).
+    """
+    extension = os.path.splitext(path)[1].lower()
+    return READERS.get(extension, read_csv_source)(path, columns, sheet)
@@ -0,0 +1,364 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit, parse_qs
+
+import pandas as pd
+
+from psa_loader import load_psa_data, SUMMARY_COLUMNS
+from psa_summary import rollup_metrics, FINAL_SUMMARY_METRICS
+from psa_cube import build_cube
+from psa_dates import add_date_index, BUCKETS, DATE_COLUMN, DATE_PREFIX
+
+# Local JSON query service for the Final Summary metrics (fdrf.py). The source
+# is loaded once into the compact representation and a filter cube; queries
+# with one value per filter are answered from the cube, queries with several
+# values for a key (e.g. two Months) from the in-memory rows. Results are kept
+# in an LRU cache that is dropped, together with the data, when the source
+# file changes. A Created Date window (from / to, or the last N weeks) is
+# found by binary search in a DateIndex and aggregated from just those rows,
+# which may also be broken out by Created Month, Week or Quarter.
+#
+# Requests are answered on worker threads, so a slow query or a reload does
+# not hold up the event loop. A reload builds a new snapshot (rows, cube,
+# DateIndex and an empty result cache) beside the current one and swaps it in
+# with a single assignment; requests keep the snapshot they started with, and
+# while one request reloads, the others are answered from the previous data.
+#
+#   GET /metrics?Affiliate=ASC&Month=Aug'25               slice totals
+#   GET /metrics?Affiliate=ASC&group_by=DIV_NAME          ... broken out by DIV_NAME
+#   GET /metrics?Month=Aug'25&Month=Sep'25&group_by=Tag   several values of a key
+#   GET /metrics?last_weeks=4&group_by=Created Week       the last 4 weeks, week by week
+#   GET /metrics?from=2025-08-01&to=2025-10-01            Created Date window (to excluded)
+#   GET /dimensions                                       values of every key
+#   GET /health                                           source, row count, cache stats
+
+QUERY_KEYS = ["Tag", "Affiliate", "DIV_NAME", "Month"]
+TIME_KEYS = [f"{DATE_PREFIX} {bucket}" for bucket in BUCKETS]
+DEFAULT_PORT = 8765
+
+
+class LRUCache:
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class QueryError(ValueError):
+    pass
+
+
+def _records(frame):
+    """
+    DataFrame rows as JSON-ready dicts (missing values become null)
+    """
+    records = frame.astype(object).to_dict(orient="records")
+    return [{key: _plain(value) for key, value in record.items()} for record in records]
+
+
+def _plain(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if hasattr(value, "item"):
+        return value.item()
+    return value
+
+
+class Snapshot:
+    """
+    One load of the source: its rows, filter cube, DateIndex (None without a
+    Created Date) and the results computed from them
+    """
+
+    def __init__(self, version, df, cube, dates, cache_size):
+        self.version = version
+        self.df = df
+        self.cube = cube
+        self.dates = dates
+        self.cache = LRUCache(cache_size)
+        self.loaded_at = time.time()
+
+
+class PSAQueryService:
+    """
+    In-memory PSA data, filter cube and result cache for one source file
+    """
+
+    def __init__(self, source, cache_size=1024, metrics=FINAL_SUMMARY_METRICS, keys=QUERY_KEYS):
+        self.source = source
+        self.metrics = metrics
+        self.keys = list(keys)
+        self.cache_size = cache_size
+        self.reloads = 0
+        self.snapshot = None
+        self.reload_lock = threading.Lock()
+        self.refresh()
+
+    # The current snapshot's parts, for callers outside a request
+    @property
+    def df(self):
+        return self.snapshot.df
+
+    @property
+    def cube(self):
+        return self.snapshot.cube
+
+    @property
+    def dates(self):
+        return self.snapshot.dates
+
+    def _source_version(self):
+        stat = os.stat(self.source)
+        return stat.st_mtime_ns, stat.st_size
+
+    def refresh(self):
+        """
+        Load a new snapshot if the source file changed; returns True when it
+        did. If another request is already reloading, returns False at once
+        and the current snapshot is used in the meantime.
+        """
+        version = self._source_version()
+        if self.snapshot is not None and version == self.snapshot.version:
+            return False
+        if not self.reload_lock.acquire(blocking=self.snapshot is None):
+            return False
+        try:
+            if self.snapshot is not None and version == self.snapshot.version:
+                return False            # reloaded while this request waited
+            columns = SUMMARY_COLUMNS + [key for key in self.keys + [DATE_COLUMN] if key not in SUMMARY_COLUMNS]
+            # The buckets and the DateIndex share one conversion of the dates
+            df = load_psa_data(self.source, columns=columns, compact=True)
+            df, dates = add_date_index(df) if DATE_COLUMN in df.columns else (df, None)
+            cube = build_cube(df, self.keys, self.metrics)
+            self.snapshot = Snapshot(version, df, cube, dates, self.cache_size)
+            self.reloads += 1
+        finally:
+            self.reload_lock.release()
+        return True
+
+    def parse(self, params, snapshot=None):
+        """
+        Turn query parameters into (filters, group_by, window): filters maps a
+        key to a tuple of accepted values, window is a (start, end) Created
+        Date range or None
+        """
+        snapshot = snapshot or self.snapshot
+        filters = {}
+        group_by = []
+        bounds = {}
+        last_weeks = None
+        for name, values in params.items():
+            if name == "group_by":
+                group_by = [key for value in values for key in value.split(",") if key]
+            elif name in self.keys:
+                filters[name] = tuple(dict.fromkeys(values))
+            elif name in ("from", "to"):
+                try:
+                    bounds[name] = pd.Timestamp(values[-1])
+                except ValueError:
+                    raise QueryError(f"'{name}' is not a date: {values[-1]!r}") from None
+            elif name == "last_weeks":
+                if not values[-1].isdigit() or int(values[-1]) < 1:
+                    raise QueryError(f"last_weeks must be a positive whole number, not {values[-1]!r}")
+                last_weeks = int(values[-1])
+            else:
+                raise QueryError(f"Unknown parameter '{name}'; filter keys are {self.keys}, "
+                                 f"plus group_by, from, to and last_weeks")
+        unknown = [key for key in group_by if key not in self.keys + TIME_KEYS]
+        if unknown:
+            raise QueryError(f"Cannot group by {unknown}; keys are {self.keys + TIME_KEYS}")
+
+        window = None
+        if bounds or last_weeks or any(key in TIME_KEYS for key in group_by):
+            if snapshot.dates is None:
+                raise QueryError(f"The source has no '{DATE_COLUMN}' column to filter or group by")
+            if last_weeks and bounds:
+                raise QueryError("Give either last_weeks or from / to, not both")
+            window = snapshot.dates.last(weeks=last_weeks) if last_weeks else (bounds.get("from"), bounds.get("to"))
+        return filters, group_by, window
+
+    def query(self, filters, group_by, window=None, snapshot=None):
+        """
+        Metrics for the rows matching filters (and dated within window): the
+        slice total and, with group_by, one row per group. Results are cached
+        per query.
+        """
+        snapshot = snapshot or self.snapshot
+        cache_key = (tuple(sorted(filters.items())), tuple(group_by), window)
+        result = snapshot.cache.get(cache_key)
+        if result is not None:
+            return result, True
+
+        if window is None and all(len(values) == 1 for values in filters.values()):
+            single = {key: values[0] for key, values in filters.items()}
+            overlap = set(single) & set(group_by)
+            if overlap:
+                raise QueryError(f"{sorted(overlap)} both filtered to one value and grouped by")
+            total = {key: _plain(value) for key, value in snapshot.cube.lookup(single).items()}
+            rows = _records(snapshot.cube.rows(single, group_by)[group_by + list(snapshot.cube.columns)]) \
+                if group_by else None
+        else:
+            # Several values for a key, or a date window: distinct counts over
+            # them need the rows, not the cube. A window only touches the rows
+            # the DateIndex finds in it.
+            rows_in = snapshot.df if window is None else snapshot.dates.take(snapshot.df, *window)
+            mask = pd.Series(True, index=rows_in.index)
+            for key, values in filters.items():
+                mask &= rows_in[key].isin(values)
+            # (with no key at all, any key will do: only the grand total is kept)
+            keys = group_by + [key for key in filters if key not in group_by] or self.keys[:1]
+            results = rollup_metrics(rows_in[mask], keys, self.metrics, [group_by, []] if group_by else [[]])
+            total_rows = results[-1]
+            total = _records(total_rows[list(self.metrics)])[0] if len(total_rows) else \
+                {name: 0 for name in self.metrics}
+            rows = _records(results[0][group_by + list(self.metrics)]) if group_by else None
+
+        result = {"filters": {key: list(values) for key, values in filters.items()}, "total": total}
+        if window is not None:
+            result["window"] = {"from": None if window[0] is None else window[0].isoformat(),
+                                "to": None if window[1] is None else window[1].isoformat()}
+        if group_by:
+            result["group_by"] = group_by
+            result["rows"] = rows
+        snapshot.cache.put(cache_key, result)
+        return result, False
+
+    def dimensions(self, snapshot=None):
+        snapshot = snapshot or self.snapshot
+        return {key: [_plain(value) for value in values] for key, values in snapshot.cube.values.items()}
+
+    def health(self, snapshot=None):
+        snapshot = snapshot or self.snapshot
+        cache = snapshot.cache
+        return {"source": os.path.abspath(self.source), "rows": len(snapshot.df),
+                "cube_cells": len(snapshot.cube.frame), "loaded_at": snapshot.loaded_at, "reloads": self.reloads,
+                "cache": {"size": len(cache.entries), "max_size": cache.max_size,
+                          "hits": cache.hits, "misses": cache.misses}}
+
+    def handle(self, target):
+        """
+        Answer one GET request target; returns (HTTP status, JSON-ready body).
+        Blocking: the server runs it on a worker thread.
+        """
+        start = time.perf_counter()
+        url = urlsplit(target)
+        try:
+            self.refresh()
+        except OSError as e:
+            return 503, {"error": f"Source unavailable: {e}"}
+        # The whole request uses one snapshot, even if a reload swaps it meanwhile
+        snapshot = self.snapshot
+        try:
+            if url.path == "/metrics":
+                filters, group_by, window = self.parse(parse_qs(url.query, keep_blank_values=True), snapshot)
+                body, cached = self.query(filters, group_by, window, snapshot)
+                body = dict(body, cached=cached)
+            elif url.path == "/dimensions":
+                body = {"dimensions": self.dimensions(snapshot)}
+            elif url.path == "/health":
+                body = self.health(snapshot)
+            else:
+                return 404, {"error": f"Unknown path '{url.path}'; use /metrics, /dimensions or /health"}
+        except (QueryError, KeyError) as e:
+            return 400, {"error": str(e).strip('"')}
+        body["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        return 200, body
+
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+async def _handle_connection(service, reader, writer):
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            parts = request_line.decode("latin-1").split()
+            if len(parts) != 3:
+                break
+            method, target, version = parts
+            if method != "GET":
+                status, body = 405, {"error": "Only GET is supported"}
+            else:
+                try:
+                    # Off the event loop, so other connections are served meanwhile
+                    status, body = await asyncio.to_thread(service.handle, target)
+                except Exception as e:
+                    status, body = 500, {"error": f"{type(e).__name__}: {e}"}
+
+            payload = json.dumps(body).encode("utf-8")
+            keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+            writer.write(
+                f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + payload)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(source, host="127.0.0.1", port=DEFAULT_PORT, cache_size=1024):
+    service = PSAQueryService(source, cache_size=cache_size)
+    server = await asyncio.start_server(lambda r, w: _handle_connection(service, r, w), host, port)
+    print(f"✅ Loaded {len(service.df):,} rows from {os.path.abspath(source)}")
+    print(f"🌐 Serving PSA metrics on http://{host}:{port}/metrics (Ctrl+C to stop)")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the Final Summary metrics as JSON over local HTTP.")
+    parser.add_argument("source", nargs="?", default="Database.xlsx")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--cache-size", type=int, default=1024, help="query results kept in the LRU cache")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.source, args.host, args.port, args.cache_size))
+    except KeyboardInterrupt:
+        pass
+    except FileNotFoundError:
+        print(f"❌ Error: '{args.source}' not found. Please check the file path.")
@@ -0,0 +1,401 @@
+import numpy as np
+import pandas as pd
+
+import psa_hll
+
+ID_COLUMN = "HCP Selection Request ID"
+FLAG_COLUMNS = ["Is PSA Created", "PSA Activity Executed"]
+
+# === METRIC REGISTRY ===
+# Each metric set maps an output column to a declarative spec:
+#   {"type": "unique", "column": ..., "where": flag}  distinct values of column,
+#                                                     optionally only where flag == 1
+#   {"type": "sum", "column": ...}                    sum of a 0/1 flag column
+#   {"type": "count", "column": ...}                  non-missing values of column
+#   {"type": "ratio", "numerator": ..., "denominator": ...}
+#                                                     numerator / denominator * 100,
+#                                                     0 where the denominator is 0
+# Ratios refer to other metrics of the same set by name. A new KPI is a new
+# entry here; it is folded into the same aggregation pass.
+
+# Final Summary (fdrf.py), as defined in prompt.txt
+FINAL_SUMMARY_METRICS = {
+    "HCP Selection Request": {"type": "unique", "column": ID_COLUMN},
+    "PSA Created": {"type": "unique", "column": ID_COLUMN, "where": "Is PSA Created"},
+    "PSA Created %": {"type": "ratio", "numerator": "PSA Created",
+                      "denominator": "HCP Selection Request"},
+    "PSA Activity Executed": {"type": "unique", "column": ID_COLUMN, "where": "PSA Activity Executed"},
+    "PSA Executed %": {"type": "ratio", "numerator": "PSA Activity Executed",
+                       "denominator": "HCP Selection Request"},
+}
+
+# SummaryData sheet of the interactive dashboard (ctcg.py)
+DASHBOARD_METRICS = {
+    "HCP_Selection_Request_Count": {"type": "count", "column": ID_COLUMN},
+    "PSA_Created_Count": {"type": "sum", "column": "Is PSA Created"},
+    "PSA_Activity_Executed_Count": {"type": "sum", "column": "PSA Activity Executed"},
+    "PSA_Created_Percent": {"type": "ratio", "numerator": "PSA_Created_Count",
+                            "denominator": "HCP_Selection_Request_Count"},
+    "PSA_Executed_Percent": {"type": "ratio", "numerator": "PSA_Activity_Executed_Count",
+                             "denominator": "PSA_Created_Count"},
+}
+
+METRIC_TYPES = ("unique", "sum", "count", "ratio")
+
+
+def compile_metrics(metrics):
+    """
+    Validate a metric set and turn it into an aggregation plan: the additive
+    metrics, the unique metrics grouped by id column (each id column is
+    deduplicated once for all of its flag filters) and the ratios
+    """
+    plan = {"additive": [], "unique": {}, "ratio": []}
+    for name, spec in metrics.items():
+        kind = spec.get("type")
+        if kind not in METRIC_TYPES:
+            raise ValueError(f"Metric '{name}' has unknown type {kind!r}; expected one of {METRIC_TYPES}")
+        if kind == "ratio":
+            for ref in (spec["numerator"], spec["denominator"]):
+                if ref not in metrics or metrics[ref]["type"] == "ratio":
+                    raise ValueError(f"Ratio '{name}' refers to '{ref}', which is not a count metric")
+            plan["ratio"].append((name, spec))
+        elif kind == "unique":
+            plan["unique"].setdefault(spec["column"], []).append((name, spec.get("where")))
+        else:
+            plan["additive"].append((name, spec))
+    return plan
+
+
+def metric_columns(metrics):
+    """
+    Source columns a metric set reads
+    """
+    columns = set()
+    for spec in metrics.values():
+        if spec["type"] == "ratio":
+            continue
+        columns.add(spec["column"])
+        if spec.get("where"):
+            columns.add(spec["where"])
+    return columns
+
+
+def encode_groups(df, keys):
+    """
+    Number the groups of df by keys in sorted order (-1 for rows with a
+    missing key) and return the codes with one label row per group
+    """
+    codes = df.groupby(keys, sort=True, dropna=True, observed=True).ngroup()
+    codes = codes.fillna(-1).to_numpy(dtype=np.int64)
+    group_ids, first_rows = np.unique(codes, return_index=True)
+    first_rows = first_rows[group_ids >= 0]
+    labels = df[keys].iloc[first_rows].reset_index(drop=True)
+    return codes, labels
+
+
+def dedupe_pairs(group_codes, id_codes, flags):
+    """
+    Collapse rows to distinct (group, id) pairs. Each pair keeps, per flag,
+    whether any of its rows had the flag set.
+    """
+    valid = (group_codes >= 0) & (id_codes >= 0)
+    group_codes = group_codes[valid]
+    id_codes = id_codes[valid]
+    flags = flags[valid]
+
+    n_ids = int(id_codes.max()) + 1 if len(id_codes) else 1
+    pair_keys = group_codes * n_ids + id_codes
+    order = np.argsort(pair_keys, kind="stable")
+    pair_keys = pair_keys[order]
+    starts = np.flatnonzero(np.r_[True, pair_keys[1:] != pair_keys[:-1]]) if len(pair_keys) \
+        else np.zeros(0, dtype=np.int64)
+
+    pair_groups = pair_keys[starts] // n_ids
+    pair_ids = pair_keys[starts] % n_ids
+    if len(order):
+        pair_flags = np.maximum.reduceat(flags[order], starts, axis=0)
+    else:
+        pair_flags = flags[:0]
+    return pair_groups, pair_ids, pair_flags
+
+
+def _flag(series):
+    # == 1 as uint8, treating missing values (nullable dtypes) as unset
+    return series.eq(1).fillna(False).to_numpy(dtype=np.uint8)
+
+
+def flag_matrix(df, flag_columns):
+    """
+    One uint8 column per flag column, 1 where the flag is set
+    """
+    if not flag_columns:
+        return np.zeros((len(df), 0), dtype=np.uint8)
+    return np.column_stack([_flag(df[col]) for col in flag_columns])
+
+
+def _ratio(numerator, denominator):
+    numerator = np.asarray(numerator, dtype=np.float64)
+    denominator = np.asarray(denominator, dtype=np.float64)
+    ratio = np.divide(numerator, denominator, out=np.zeros_like(numerator), where=denominator > 0)
+    return np.round(ratio * 100, 2)
+
+
+def rollup_metrics(df, keys, metrics, grouping_sets, approximate=None):
+    """
+    Compute a metric set for several GROUPING SETS in one pass: one result per
+    entry of grouping_sets, each a subset of keys ([] for the grand total).
+
+    Rows are grouped once at the finest level (keys). Additive metrics are
+    summed per fine group and rolled up by summing. Unique metrics
+    deduplicate rows to (group, id) pairs once; every coarser level is rolled
+    up from those pairs, re-deduplicating ids that appear under more than one
+    fine group, so totals are true distinct counts rather than sums of group
+    counts. Ratios are derived last. Key columns that a grouping set rolls up
+    are left missing in its result.
+
+    With approximate set to a relative error bound (e.g. 0.02), unique
+    metrics are estimated from a HyperLogLog sketch per cell instead, and
+    coarser levels merge the sketches. Each estimated metric is followed by
+    a "<name> ±" column holding its absolute standard error.
+    """
+    plan = compile_metrics(metrics)
+    state = fine_state(df, list(keys), plan, approximate)
+    return rollup_state(state, list(keys), metrics, plan, grouping_sets)
+
+
+def additive_is_integer(df, spec):
+    """
+    Whether an additive metric's totals are whole numbers
+    """
+    values = df[spec["column"]]
+    return spec["type"] == "count" or pd.api.types.is_integer_dtype(values) \
+        or pd.api.types.is_bool_dtype(values)
+
+
+def additive_weights(df, spec):
+    """
+    Per-row float64 contribution of an additive metric (missing values add 0)
+    """
+    values = df[spec["column"]]
+    if spec["type"] == "count":
+        return values.notna().to_numpy(dtype=np.float64)
+    return values.fillna(0).to_numpy(dtype=np.float64)
+
+
+def fine_state(df, keys, plan, approximate=None):
+    """
+    Aggregate rows to the finest grouping level: group labels, additive
+    totals per group, and per id column the deduplicated (group, id) pairs
+    (or, when approximate, one HyperLogLog sketch per group and metric)
+    """
+    group_codes, labels = encode_groups(df, keys)
+    n_groups = len(labels)
+    in_group = group_codes >= 0
+
+    additive = {}
+    for name, spec in plan["additive"]:
+        totals = np.bincount(group_codes[in_group], weights=additive_weights(df, spec)[in_group],
+                             minlength=n_groups)
+        if additive_is_integer(df, spec):
+            totals = totals.astype(np.int64)
+        additive[name] = totals
+
+    state = {"labels": labels, "additive": additive, "unique": [], "sketches": None}
+    if approximate is not None:
+        precision = psa_hll.precision_for_error(approximate)
+        sketches = {}
+        for id_column, entries in plan["unique"].items():
+            id_codes = pd.factorize(df[id_column])[0]
+            counted = in_group & (id_codes >= 0)
+            hashes = psa_hll.hash_codes(id_codes[counted])
+            for name, where in entries:
+                rows = counted if where is None else counted & _flag(df[where]).astype(bool)
+                keep = rows[counted]
+                sketches[name] = psa_hll.build_sketches(group_codes[rows], hashes[keep], n_groups, precision)
+        state["sketches"] = sketches
+        state["precision"] = precision
+        return state
+
+    for id_column, entries in plan["unique"].items():
+        id_codes = pd.factorize(df[id_column])[0].astype(np.int64)
+        flag_columns = [where for _, where in entries if where is not None]
+        pairs = dedupe_pairs(group_codes, id_codes, flag_matrix(df, flag_columns))
+        state["unique"].append((entries, flag_columns, pairs))
+    return state
+
+
+def rollup_state(state, keys, metrics, plan, grouping_sets):
+    """
+    Roll a fine-level state up to each grouping set and derive the ratios
+    """
+    labels = state["labels"]
+    n_groups = len(labels)
+    results = []
+    for grouping_set in grouping_sets:
+        grouping_set = list(grouping_set)
+        if grouping_set == keys:
+            fine_to_coarse, coarse_labels = None, labels.copy()
+        elif grouping_set:
+            fine_to_coarse, coarse_labels = encode_groups(labels, grouping_set)
+        else:
+            fine_to_coarse = np.zeros(n_groups, dtype=np.int64)
+            coarse_labels = pd.DataFrame(index=pd.RangeIndex(1 if n_groups else 0))
+        n_coarse = len(coarse_labels)
+
+        columns = {}
+        for name, totals in state["additive"].items():
+            if fine_to_coarse is None:
+                columns[name] = totals
+            else:
+                rolled = np.bincount(fine_to_coarse, weights=totals, minlength=n_coarse)
+                columns[name] = rolled.astype(totals.dtype)
+
+        for entries, flag_columns, (pair_groups, pair_ids, pair_flags) in state["unique"]:
+            if fine_to_coarse is not None:
+                pair_groups, _, pair_flags = dedupe_pairs(fine_to_coarse[pair_groups], pair_ids, pair_flags)
+            for name, where in entries:
+                if where is None:
+                    counts = np.bincount(pair_groups, minlength=n_coarse)
+                else:
+                    counts = np.bincount(pair_groups, weights=pair_flags[:, flag_columns.index(where)],
+                                         minlength=n_coarse).astype(np.int64)
+                columns[name] = counts
+
+        if state["sketches"] is not None:
+            error = psa_hll.standard_error(state["precision"])
+            for name, cell_sketches in state["sketches"].items():
+                if fine_to_coarse is not None:
+                    cell_sketches = psa_hll.merge_sketches(cell_sketches, fine_to_coarse, n_coarse)
+                estimates = psa_hll.estimate(cell_sketches)
+                columns[name] = np.round(estimates).astype(np.int64)
+                columns[name + " ±"] = np.ceil(estimates * error).astype(np.int64)
+
+        for name, spec in plan["ratio"]:
+            columns[name] = _ratio(columns[spec["numerator"]], columns[spec["denominator"]])
+
+        result = coarse_labels
+        for key in keys:
+            if key not in grouping_set:
+                result[key] = None
+        result = result[keys]
+        for name in metrics:
+            result[name] = columns[name]
+            if name + " ±" in columns:
+                result[name + " ±"] = columns[name + " ±"]
+        results.append(result)
+    return results
+
+
+def compute_metrics(df, keys, metrics, approximate=None):
+    """
+    Compute a metric set per group of keys (sorted by keys, missing keys
+    dropped, as with groupby)
+    """
+    return rollup_metrics(df, keys, metrics, [keys], approximate=approximate)[0]
+
+
+# === MERGEABLE PARTIAL AGGREGATES ===
+# A partial holds one row per distinct (keys, id columns) combination with
+# the sum of each additive metric and, per unique-metric filter, whether any
+# row had the flag set. Partials of disjoint row sets merge by concatenating
+# and re-aggregating, and finalize_metrics() turns a partial into the same
+# result compute_metrics() would give on the underlying rows.
+
+def _partial_layout(metrics):
+    plan = compile_metrics(metrics)
+    id_columns = list(plan["unique"])
+    flag_columns = []
+    for entries in plan["unique"].values():
+        for _, where in entries:
+            if where is not None and where not in flag_columns:
+                flag_columns.append(where)
+    additive = [name for name, _ in plan["additive"]]
+    return id_columns, flag_columns, additive
+
+
+def partial_metrics(df, keys, metrics):
+    """
+    Reduce rows to a mergeable partial aggregate for a metric set
+    """
+    keys = list(keys)
+    id_columns, flag_columns, additive = _partial_layout(metrics)
+    specs = dict(compile_metrics(metrics)["additive"])
+
+    work = pd.DataFrame({key: df[key] for key in keys + id_columns})
+    for name in additive:
+        values = df[specs[name]["column"]]
+        work[name] = values.notna().astype(np.int64) if specs[name]["type"] == "count" else values.fillna(0)
+    for col in flag_columns:
+        work[col] = _flag(df[col])
+
+    work = work.dropna(subset=keys)
+    agg = {name: "sum" for name in additive}
+    agg.update({col: "max" for col in flag_columns})
+    if not agg:
+        return work[keys + id_columns].drop_duplicates().reset_index(drop=True)
+    return work.groupby(keys + id_columns, sort=False, dropna=False, observed=True) \
+        .agg(agg).reset_index()
+
+
+def merge_partials(partials, keys, metrics):
+    """
+    Merge partial aggregates computed over disjoint sets of rows
+    """
+    keys = list(keys)
+    id_columns, flag_columns, additive = _partial_layout(metrics)
+    combined = pd.concat(partials, ignore_index=True)
+    agg = {name: "sum" for name in additive}
+    agg.update({col: "max" for col in flag_columns})
+    if not agg:
+        return combined.drop_duplicates().reset_index(drop=True)
+    return combined.groupby(keys + id_columns, sort=False, dropna=False, observed=True) \
+        .agg(agg).reset_index()
+
+
+def finalize_metrics(partial, keys, metrics, grouping_sets=None):
+    """
+    Compute a metric set from a partial aggregate: one result per grouping
+    set, or a single per-group result when grouping_sets is omitted
+    """
+    keys = list(keys)
+    finals = {}
+    for name, spec in metrics.items():
+        if spec["type"] in ("sum", "count"):
+            finals[name] = {"type": "sum", "column": name}
+        else:
+            finals[name] = spec
+    if grouping_sets is None:
+        return rollup_metrics(partial, keys, finals, [keys])[0]
+    return rollup_metrics(partial, keys, finals, grouping_sets)
+
+
+def summarize_chunks(chunks, keys, metrics, grouping_sets=None):
+    """
+    Fold an iterable of DataFrame chunks into one partial aggregate and
+    finalise it, so only the partial (one row per distinct keys/id
+    combination), not the rows, is held in memory.
+
+    Chunk partials are merged into the running total whenever they outgrow
+    it, which keeps the total merge work linear. Returns the result of
+    finalize_metrics() and the number of rows read.
+    """
+    keys = list(keys)
+    merged = None
+    pending = []
+    pending_rows = 0
+    rows = 0
+    for chunk in chunks:
+        rows += len(chunk)
+        partial = partial_metrics(chunk, keys, metrics)
+        pending.append(partial)
+        pending_rows += len(partial)
+        if merged is None or pending_rows >= len(merged):
+            merged = merge_partials(([] if merged is None else [merged]) + pending, keys, metrics)
+            pending, pending_rows = [], 0
+
+    if merged is None:
+        empty = pd.DataFrame({col: [] for col in keys + sorted(metric_columns(metrics))})
+        merged = partial_metrics(empty, keys, metrics)
+    elif pending:
+        merged = merge_partials([merged] + pending, keys, metrics)
+    return finalize_metrics(merged, keys, metrics, grouping_sets), rows
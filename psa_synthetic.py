@@ -0,0 +1,237 @@
+import os
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+from excel_writer import frame_rows
+
+# Seeded generator for data shaped like "PSA Database.csv": same 33 columns
+# in the same order, with cardinalities and rates taken from the shipped
+# Database.xlsx extract.
+
+DIVISIONS = {
+    ("AIL", "GI Prima"): 0.1264, ("AIL", "GI Optima"): 0.0755, ("AIL", "GI Maxima"): 0.0453,
+    ("AIL", "GI Prospera"): 0.0292, ("AIL", "GenNext"): 0.0246, ("AIL", "Metabolics"): 0.1025,
+    ("AIL", "NeuroLife"): 0.0649, ("AIL", "Vaccines"): 0.0296, ("AIL", "WH- Mitera"): 0.0369,
+    ("APC", "ASHA"): 0.0001, ("APC", "General Medicine"): 0.0141, ("APC", "Multi Therapy"): 0.0290,
+    ("APC", "NovaNXT"): 0.0004, ("APC", "Orocare"): 0.0068, ("APC", "Osvita"): 0.0316,
+    ("APC", "Osvita Biologics"): 0.0155, ("APC", "Restora"): 0.0036,
+    ("ASC", "Abbott Spectra"): 0.0187, ("ASC", "Abbott Victora"): 0.0191, ("ASC", "CCD CORDIS"): 0.0297,
+    ("ASC", "CCD THROMBIS"): 0.0366, ("ASC", "Derma Magna"): 0.0175, ("ASC", "Derma Prime"): 0.0212,
+    ("ASC", "Diabetes Maximus"): 0.0342, ("ASC", "FUTURA"): 0.0024, ("ASC", "Hospital Care"): 0.0023,
+    ("ASC", "Infinia"): 0.0666, ("ASC", "Invicta"): 0.0409, ("ASC", "LifeCare"): 0.0029,
+    ("ASC", "Quantus"): 0.0290, ("ASC", "Supremus"): 0.0428,
+}
+
+CHOICES = {
+    "Type Of Activity": {
+        "CME": 0.647, "ISP/HO Driven Activities": 0.183, "Group Consulting Program Regional Adboards": 0.075,
+        "Patient Awareness Program": 0.032, "Group Consulting Program National Adboards": 0.018,
+        "Health Clinics - Out-Clinic": 0.015, "Workshop": 0.014, "Case Study": 0.009,
+        "Promotional Materials": 0.004, "Symposium": 0.002,
+        "Third Party Conference Participation (Session, Stall, etc.)": 0.001,
+    },
+    "Approver: Full Name": {"Girish Bhide": 0.38, "SANDEEP JOSHI": 0.353, "Rahul Gurav": 0.267},
+    "Tag": {"Part of Project Shield": 0.694, "Outside of Project Shield": 0.306},
+    "PSA Activity: Doctor: Customer Type": {"Doctor": 1.0},
+    "PSA Activity: Doctor: Tier Type": {"Tier2": 0.424, "Tier3": 0.309, "Tier4": 0.14, "Tier1": 0.127},
+    "PSA Activity: Release Status": {"Approved": 0.922, "Rejected": 0.049, "Draft": 0.017,
+                                     "In Approval Process": 0.013},
+    "PSA Activity: Doctor: Speciality by Practice": {
+        "CARDIOLOGIST": 0.151, "GASTROENTEROLOGIST": 0.122, "Internal Medicine Specialist": 0.096,
+        "OB-GYN": 0.088, "ENDOCRINOLOGIST": 0.079, "Surgeon": 0.057,
+        "Family Medicine/Primary Care Physician": 0.052, "NEUROLOGIST": 0.047, "DERMATOLOGIST": 0.04,
+        "Gastroenterologist (Hepatology)": 0.036, "Orthopedic Specialist (Nonsurgical)": 0.031,
+        "Otorhinolaryngologist": 0.026, "Pediatrician": 0.025, "PSYCHIATRIST": 0.024,
+        "Critical Care Intensivist": 0.02, "Diabetes Educator": 0.019, "Addiction Medicine Specialist": 0.014,
+        "RHEUMATOLOGIST": 0.008, "PULMONOLOGIST": 0.007, "DENTIST": 0.007,
+    },
+    "PSA Activity: Doctor: FMV Qualification": {
+        "MD/ MS/ MDS/DNB/MS Gynec / MD Psy / MD Chest / MD Skin / MD or MS Anaes / MS ENT / MS Ortho/ "
+        "MD + Dip Card / MD + CCM": 0.533,
+        "DM / MCh / MD + DNB Superspecialty (Gastro / Neurology/ Cardio / Nephro / Paediatric) / "
+        "MD + MRCP/FRCP/FRCS/ MBBS + DNB Neurosurgery /Neurology": 0.39,
+        "MBBS + Diploma (DGO / DLO / DCH / DPM / DO / D Orth / DA / DVD / DD (Derma) / Dip Diab/ "
+        "Dip Card / Dip in CCM)": 0.049,
+        "National / Regional KOLs": 0.025, "MBBS/BDS": 0.003,
+    },
+    "Is Resubmitted": {0: 0.739, 1: 0.261},
+    "Request Rejection Counter": {0: 0.739, 1: 0.153, 2: 0.064, 3: 0.023, 4: 0.011, 5: 0.006, 6: 0.004},
+}
+
+# Share of requests created in each month of 2025
+MONTH_WEIGHTS = {1: 0.017, 2: 0.10, 3: 0.128, 4: 0.158, 5: 0.176, 6: 0.116, 7: 0.114, 8: 0.096,
+                 9: 0.082, 10: 0.013}
+
+PSA_CREATED_RATE = 0.979
+PSA_EXECUTED_RATE = 0.735       # among rows with a PSA created
+EXCEL_EPOCH = "1899-12-30"
+EXCEL_MAX_ROWS = 1_048_576      # including the header row
+
+CSV_COLUMNS = [
+    "Affiliate", "ARF: Division", "DIV_NAME", "ARF: Name", "ARF No", "HCP Selection Request ID",
+    "Doctor Selection Request Name", "Type Of Activity", "Approver: Full Name",
+    "Doctor Selection Request Tag", "Is PSA Created", "PSA Activity Executed",
+    "Doctor Rejection Counter", "Request Rejection Counter", "Is Resubmitted", "Requestor Territory",
+    "Preferred Territory", "Preferred Territory 2", "Preferred Territory 3", "PSA Activity: PSA Ref No",
+    "PSA Activities Name", "PSA Activity: Doctor: Account Name", "PSA Activity: Doctor: Customer Code",
+    "PSA Activity: Doctor: Customer Type", "PSA Activity: Doctor: FMV Qualification",
+    "PSA Activity: Doctor: Speciality by Practice", "PSA Activity: Doctor: Tier Type",
+    "PSA Activity: Release Status", "PSA Activity: Requestor Territory", "PSA Activity: Territory",
+    "Tag", "Created Date", "Month",
+]
+
+_BASE62 = np.frombuffer(b"0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz", dtype=np.uint8)
+
+
+def _choice(rng, options, n):
+    values = list(options)
+    weights = np.array(list(options.values()), dtype=np.float64)
+    picks = rng.choice(len(values), size=n, p=weights / weights.sum())
+    return np.array(values, dtype=object)[picks]
+
+
+def _coded(prefix, numbers, width, alphabet=None):
+    """
+    prefix + fixed-width code of each number (decimal, or base62 with
+    alphabet), built without a Python loop per row
+    """
+    numbers = np.asarray(numbers, dtype=np.int64)
+    if alphabet is None:
+        text = np.char.zfill(numbers.astype(f"U{width}"), width)
+    else:
+        digits = np.empty((len(numbers), width), dtype=np.uint8)
+        rest = numbers.copy()
+        for pos in range(width - 1, -1, -1):
+            digits[:, pos] = alphabet[rest % len(alphabet)]
+            rest //= len(alphabet)
+        text = digits.view(f"S{width}").ravel().astype(f"U{width}")
+    return np.char.add(prefix, text).astype(object)
+
+
+def _territories(rng, n, prefix, missing_rate):
+    values = _coded(prefix, rng.integers(0, 30000, size=n), 6)
+    values[rng.random(n) < missing_rate] = np.nan
+    return values
+
+
+def _serials(rng, n):
+    """
+    Excel serial dates: a month drawn from MONTH_WEIGHTS, then a day in it
+    """
+    months = np.array(list(MONTH_WEIGHTS))
+    weights = np.array(list(MONTH_WEIGHTS.values()))
+    starts = pd.to_datetime([f"2025-{m:02d}-01" for m in months]).to_numpy()
+    lengths = pd.to_datetime([f"2025-{m:02d}-01" for m in months]).days_in_month.to_numpy()
+    picks = rng.choice(len(months), size=n, p=weights / weights.sum())
+    first = (starts - np.datetime64(EXCEL_EPOCH)).astype("timedelta64[D]").astype(np.int64)
+    return first[picks] + (rng.random(n) * lengths[picks]).astype(np.int64)
+
+
+def _months(serials):
+    """
+    "Mon'YY" labels, formatted once per distinct date
+    """
+    days, inverse = np.unique(serials, return_inverse=True)
+    dates = pd.to_datetime(days, unit="D", origin=EXCEL_EPOCH)
+    labels = (dates.strftime("%b") + "'" + dates.strftime("%y")).to_numpy(dtype=object)
+    return labels[inverse]
+
+
+def generate_psa_frame(n_rows, seed=0, columns=None, duplicate_rate=0.0, first_id=0):
+    """
+    Generate n_rows of synthetic PSA data with the "PSA Database.csv" schema.
+
+    Each row gets its own HCP Selection Request ID, as in the real extract;
+    duplicate_rate is the share of rows that instead reuse an earlier ID, to
+    exercise distinct counting. columns restricts generation (and the output)
+    to a subset of CSV_COLUMNS. The same seed always gives the same frame;
+    seed may also be a sequence of ints (e.g. (seed, chunk number)). IDs are
+    numbered from first_id, so frames generated with disjoint ID ranges can
+    be concatenated.
+    """
+    wanted = CSV_COLUMNS if columns is None else [col for col in CSV_COLUMNS if col in columns]
+    n = int(n_rows)
+
+    # Shared draws first, then one generator per column seeded from its
+    # position, so a column's values do not depend on which others were asked for
+    entropy = [int(part) for part in np.atleast_1d(seed)]
+    rng = np.random.default_rng(entropy)
+    pairs = list(DIVISIONS)
+    division = rng.choice(len(pairs), size=n, p=np.array(list(DIVISIONS.values())) / sum(DIVISIONS.values()))
+    created = (rng.random(n) < PSA_CREATED_RATE).astype(np.int64)
+    executed = created * (rng.random(n) < PSA_EXECUTED_RATE).astype(np.int64)
+    serials = _serials(rng, n)
+    id_numbers = rng.permutation(n).astype(np.int64) + 10_000_000 + first_id
+    if duplicate_rate:
+        reuse = rng.random(n) < duplicate_rate
+        id_numbers[reuse] = id_numbers[rng.integers(0, n, size=int(reuse.sum()))]
+
+    generators = {
+        "Affiliate": lambda rng: np.array([p[0] for p in pairs], dtype=object)[division],
+        "ARF: Division": lambda rng: division + 25,
+        "DIV_NAME": lambda rng: np.array([p[1] for p in pairs], dtype=object)[division],
+        "ARF: Name": lambda rng: _coded("C2 2025 e-CME Programme ", rng.integers(0, 750, size=n), 3),
+        "ARF No": lambda rng: _coded("25A", division + 25, 2) + _coded("-", rng.integers(0, 5000, size=n), 4) + "F",
+        "HCP Selection Request ID": lambda rng: _coded("a8HId", id_numbers, 10, _BASE62),
+        "Doctor Selection Request Name": lambda rng: _coded("HCP_SEL-", id_numbers % 1_000_000, 6),
+        "Doctor Selection Request Tag": lambda rng: np.ones(n, dtype=np.int64),
+        "Is PSA Created": lambda rng: created,
+        "PSA Activity Executed": lambda rng: executed,
+        "Doctor Rejection Counter": lambda rng: np.minimum(rng.geometric(0.49, size=n) - 1, 21),
+        "Requestor Territory": lambda rng: _territories(rng, n, "IT0", 0.95),
+        "Preferred Territory": lambda rng: _territories(rng, n, "IT0", 0.0),
+        "Preferred Territory 2": lambda rng: _territories(rng, n, "IT0", 0.85),
+        "Preferred Territory 3": lambda rng: _territories(rng, n, "IT0", 0.87),
+        "PSA Activity: PSA Ref No": lambda rng: _coded("PSA-", id_numbers + 200_000_000, 10),
+        "PSA Activities Name": lambda rng: np.where(executed == 1, "PSA Activity Executed", None).astype(object),
+        "PSA Activity: Doctor: Account Name": lambda rng: _coded("Dr Account ", rng.integers(0, n // 2 + 1, size=n), 7),
+        "PSA Activity: Doctor: Customer Code": lambda rng: _coded("DS-", rng.integers(0, n // 2 + 1, size=n), 8),
+        "PSA Activity: Requestor Territory": lambda rng: _territories(rng, n, "IA0", 0.0),
+        "PSA Activity: Territory": lambda rng: _territories(rng, n, "IT0", 0.0),
+        "Created Date": lambda rng: serials,
+        "Month": lambda rng: _months(serials),
+    }
+    for column, options in CHOICES.items():
+        generators[column] = (lambda rng, options=options: _choice(rng, options, n))
+
+    data = {}
+    for column in wanted:
+        data[column] = generators[column](np.random.default_rng(entropy + [CSV_COLUMNS.index(column)]))
+    return pd.DataFrame(data, columns=wanted)
+
+
+def iter_psa_frames(n_rows, seed=0, chunk_rows=500_000, columns=None):
+    """
+    Yield n_rows of synthetic data as frames of at most chunk_rows rows, with
+    IDs unique across chunks, so large datasets never sit in memory whole
+    """
+    for chunk, start in enumerate(range(0, int(n_rows), chunk_rows)):
+        size = min(chunk_rows, int(n_rows) - start)
+        yield generate_psa_frame(size, seed=(seed, chunk), columns=columns, first_id=start)
+
+
+def write_psa_dataset(path, n_rows, seed=0, chunk_rows=500_000):
+    """
+    Write a synthetic dataset shaped like "PSA Database.csv" (.csv) or
+    "Database.xlsx" (.xlsx, one plain sheet), generated chunk by chunk
+    """
+    if path.lower().endswith(".xlsx"):
+        if n_rows >= EXCEL_MAX_ROWS:
+            raise ValueError(f"An Excel sheet holds at most {EXCEL_MAX_ROWS - 1:,} data rows, got {n_rows:,}")
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet("Sheet1")
+        ws.append(CSV_COLUMNS)
+        for frame in iter_psa_frames(n_rows, seed, chunk_rows):
+            for row in frame_rows(frame):
+                ws.append(row)
+        wb.save(path)
+        return
+
+    tmp = path + ".tmp"
+    for idx, frame in enumerate(iter_psa_frames(n_rows, seed, chunk_rows)):
+        frame.to_csv(tmp, mode="w" if idx == 0 else "a", header=idx == 0, index=False)
+    if not n_rows:
+        pd.DataFrame(columns=CSV_COLUMNS).to_csv(tmp, index=False)
+    os.replace(tmp, path)
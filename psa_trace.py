@@ -0,0 +1,206 @@
+import atexit
+import cProfile
+import json
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:             # Windows
+    resource = None
+
+# Stage-level instrumentation for the report scripts. Off by default; when
+# enabled (PSA_TRACE=<file> or a script's --trace flag) every stage records
+# wall time, CPU time, rows, rows/s and the change in resident memory, and
+# the run is written as a Chrome trace-event file that Perfetto or
+# chrome://tracing opens. Stages named in PSA_PROFILE (comma-separated, or
+# "all") also run under cProfile, each dumping a .prof file next to the trace.
+#
+# Scripts mark stages either sequentially (begin() ends the previous stage,
+# which suits the flat scripts) or with the stage() context manager.
+
+TRACE_ENV = "PSA_TRACE"
+PROFILE_ENV = "PSA_PROFILE"
+
+_tracer = None
+
+
+def _rss_mb():
+    """
+    Current resident set size in MB (peak RSS where /proc is unavailable)
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1 << 20)
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+class Tracer:
+    def __init__(self, path, profile_stages=()):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.profile_stages = set(profile_stages)
+        self.origin = time.perf_counter()
+        self.events = []
+        self.records = []
+        self.current = None         # open stage started with begin()
+        self.profiling = False
+
+    def _open(self, name, rows=None):
+        record = {"name": name, "rows": rows, "rss_before": _rss_mb(), "cpu": time.process_time(),
+                  "start": time.perf_counter(), "profiler": None}
+        if not self.profiling and (name in self.profile_stages or "all" in self.profile_stages):
+            # Only one profiler can be active at a time, so nested stages of
+            # a profiled stage show up inside its profile instead
+            record["profiler"] = cProfile.Profile()
+            self.profiling = True
+            record["profiler"].enable()
+        return record
+
+    def _close(self, record):
+        end = time.perf_counter()
+        cpu = time.process_time() - record["cpu"]
+        profiler = record.pop("profiler")
+        if profiler is not None:
+            profiler.disable()
+            self.profiling = False
+        wall = end - record["start"]
+        rss_after = _rss_mb()
+        rows = record["rows"]
+        result = {
+            "stage": record["name"],
+            "wall_seconds": round(wall, 6),
+            "cpu_seconds": round(cpu, 6),
+            "rows": rows,
+            "rows_per_second": round(rows / wall, 1) if rows is not None and wall > 0 else None,
+            "rss_mb": None if rss_after is None else round(rss_after, 1),
+            "rss_delta_mb": None if rss_after is None or record["rss_before"] is None
+            else round(rss_after - record["rss_before"], 1),
+        }
+        if profiler is not None:
+            safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "_", record["name"])
+            result["profile"] = f"{os.path.splitext(self.path)[0]}.{safe_name}.prof"
+            profiler.dump_stats(result["profile"])
+        self.records.append(result)
+
+        pid, tid = os.getpid(), threading.get_ident()
+        self.events.append({"name": record["name"], "cat": "stage", "ph": "X", "pid": pid, "tid": tid,
+                            "ts": round((record["start"] - self.origin) * 1e6, 1),
+                            "dur": round(wall * 1e6, 1),
+                            "args": {key: value for key, value in result.items() if key != "stage"}})
+        if rss_after is not None:
+            self.events.append({"name": "rss_mb", "ph": "C", "pid": pid, "tid": tid,
+                                "ts": round((end - self.origin) * 1e6, 1), "args": {"rss_mb": round(rss_after, 1)}})
+
+    def begin(self, name, rows=None):
+        self.end()
+        self.current = self._open(name, rows)
+
+    def set_rows(self, rows):
+        if self.current is not None:
+            self.current["rows"] = rows
+
+    def end(self):
+        if self.current is not None:
+            record, self.current = self.current, None
+            self._close(record)
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        record = self._open(name, rows)
+        info = {"rows": rows}
+        try:
+            yield info
+        finally:
+            record["rows"] = info["rows"]
+            self._close(record)
+
+    def write(self):
+        self.end()
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms",
+                       "otherData": {"stages": self.records}}, f, indent=1)
+
+    def report(self):
+        print("\n⏱️ Stage timings:")
+        print(f"   {'stage':<22}{'wall s':>9}{'cpu s':>9}{'rows':>11}{'rows/s':>12}{'Δ RSS MB':>10}")
+        for rec in self.records:
+            rows = "" if rec["rows"] is None else f"{rec['rows']:,}"
+            rate = "" if rec["rows_per_second"] is None else f"{rec['rows_per_second']:,.0f}"
+            delta = "" if rec["rss_delta_mb"] is None else f"{rec['rss_delta_mb']:+.1f}"
+            print(f"   {rec['stage']:<22}{rec['wall_seconds']:>9.3f}{rec['cpu_seconds']:>9.3f}"
+                  f"{rows:>11}{rate:>12}{delta:>10}")
+        print(f"   Trace written → {os.path.abspath(self.path)}")
+
+
+def start_tracing(path=None, profile=None):
+    """
+    Enable instrumentation for this process. path and profile default to the
+    PSA_TRACE and PSA_PROFILE environment variables; without a path nothing
+    is enabled and None is returned. The trace is written at exit.
+    """
+    global _tracer
+    path = path or os.environ.get(TRACE_ENV)
+    if not path:
+        return None
+    profile = profile if profile is not None else os.environ.get(PROFILE_ENV, "")
+    if isinstance(profile, str):
+        profile = [name.strip() for name in profile.split(",") if name.strip()]
+    if _tracer is None:
+        _tracer = Tracer(path, profile)
+        atexit.register(finish_tracing)
+    return _tracer
+
+
+def finish_tracing():
+    """
+    End the open stage, write the trace and print the stage table
+    """
+    global _tracer
+    if _tracer is None:
+        return
+    tracer, _tracer = _tracer, None
+    tracer.write()
+    tracer.report()
+
+
+def begin(name, rows=None):
+    """
+    Start a stage, ending the one begun before it
+    """
+    if _tracer is not None:
+        _tracer.begin(name, rows)
+
+
+def set_rows(rows):
+    """
+    Record how many rows the current begin() stage processed
+    """
+    if _tracer is not None:
+        _tracer.set_rows(rows)
+
+
+def end():
+    if _tracer is not None:
+        _tracer.end()
+
+
+@contextmanager
+def stage(name, rows=None):
+    """
+    Time a block as a stage; set info["rows"] inside it to record rows
+    """
+    if _tracer is None:
+        yield {"rows": rows}
+        return
+    with _tracer.stage(name, rows) as info:
+        yield info
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+import psa_incremental
+from psa_incremental import refresh_summary
+from psa_loader import compact_psa_frame
+from psa_summary import rollup_metrics, FINAL_SUMMARY_METRICS, DASHBOARD_METRICS
+from test_psa_summary import KEYS, _psa_frame
+
+# Incremental refresh against a full rollup_metrics() after each change:
+# partitions edited, added and dropped between runs.
+
+SETS = [KEYS, ["Affiliate"], []]
+
+
+def _assert_same(results, df, metrics):
+    for result, expected in zip(results, rollup_metrics(df, KEYS, metrics, SETS)):
+        pd.testing.assert_frame_equal(result, expected)
+
+
+def test_refresh_matches_full_rollup(tmp_path):
+    df = _psa_frame()
+    months = sorted(df["Month"].dropna().unique())
+    for metrics in (FINAL_SUMMARY_METRICS, DASHBOARD_METRICS):
+        results, stats = refresh_summary(df, KEYS, metrics, SETS, state_dir=tmp_path)
+        assert not stats["reused"]
+        _assert_same(results, df, metrics)
+
+        results, stats = refresh_summary(df, KEYS, metrics, SETS, state_dir=tmp_path)
+        assert not stats["recomputed"]
+        _assert_same(results, df, metrics)
+
+        # Edit one month, drop another and add a new one with ids from the others
+        changed = df[df["Month"] != months[1]].copy()
+        edited = (changed["Month"] == months[0]).to_numpy()
+        changed.loc[edited, "Is PSA Created"] = 1 - changed.loc[edited, "Is PSA Created"]
+        added = df[df["Month"] == months[2]].assign(Month="Jan'99")
+        changed = pd.concat([changed, added], ignore_index=True)
+        results, stats = refresh_summary(changed, KEYS, metrics, SETS, state_dir=tmp_path)
+        assert sorted(stats["recomputed"]) == sorted([str(months[0]), "Jan'99"])
+        assert stats["dropped"] == [str(months[1])]
+        _assert_same(results, changed, metrics)
+
+        # And back again
+        results, stats = refresh_summary(df, KEYS, metrics, SETS, state_dir=tmp_path)
+        _assert_same(results, df, metrics)
+
+
+def test_refresh_compact_frame(tmp_path, monkeypatch):
+    # Keep the ID dictionary's hashes between runs, as for a large extract
+    monkeypatch.setattr(psa_incremental, "LARGE_DICTIONARY", 100)
+    df = compact_psa_frame(_psa_frame())
+    results, _ = refresh_summary(df, KEYS, FINAL_SUMMARY_METRICS, SETS, state_dir=tmp_path)
+    _assert_same(results, df, FINAL_SUMMARY_METRICS)
+    shuffled = df.iloc[np.random.default_rng(0).permutation(len(df))]
+    results, _ = refresh_summary(shuffled, KEYS, FINAL_SUMMARY_METRICS, SETS, state_dir=tmp_path)
+    _assert_same(results, shuffled, FINAL_SUMMARY_METRICS)
@@ -0,0 +1,35 @@
+import os
+
+import openpyxl
+import pandas as pd
+
+from psa_readers import read_xlsx_source, _read_xlsx_streaming
+
+# The streaming xlsx reader against pd.read_excel, for sheets whose first
+# rows are blank: sheet row 1 is the header even when the XML leaves it out.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _blank_top_workbook(path):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws["C4"] = "Values"
+    ws.append([None, "Affiliate", "DIV_NAME", "Count"])
+    ws.append([None, "AIL", "GenNext", 534])
+    ws.append([None, "ASC", None, 12])
+    wb.save(path)
+
+
+def test_leading_blank_rows_match_read_excel(tmp_path):
+    path = str(tmp_path / "blank_top.xlsx")
+    _blank_top_workbook(path)
+    frame, header = _read_xlsx_streaming(path)
+    assert header == []
+    pd.testing.assert_frame_equal(frame, pd.read_excel(path))
+
+
+def test_final_summary_workbook_matches_read_excel():
+    path = os.path.join(HERE, "Final Summary.xlsx")
+    frame, _ = read_xlsx_source(path)
+    pd.testing.assert_frame_equal(frame, pd.read_excel(path))
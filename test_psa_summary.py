@@ -0,0 +1,170 @@
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import psa_hll
+from psa_loader import compact_psa_frame
+from psa_parallel import parallel_rollup_metrics
+from psa_summary import (rollup_metrics, compute_metrics, summarize_chunks, dedupe_pairs, compile_metrics,
+                         fine_state, FINAL_SUMMARY_METRICS, DASHBOARD_METRICS, ID_COLUMN)
+from psa_synthetic import generate_psa_frame
+
+# The distinct-count engine against a plain groupby().nunique() reference.
+# IDs are shared between groups (and repeated within them, with differing
+# flags), so a coarser level's counts are not the sum of the finer ones.
+
+KEYS = ["Affiliate", "DIV_NAME"]
+COLUMNS = KEYS + ["Tag", "Month", ID_COLUMN, "Is PSA Created", "PSA Activity Executed"]
+
+
+def _psa_frame(n_rows=4000, seed=0):
+    df = generate_psa_frame(n_rows, seed=seed, columns=COLUMNS, duplicate_rate=0.3)
+    rng = np.random.default_rng(seed)
+    # Move a share of the IDs to rows of other divisions and affiliates
+    shared = rng.random(n_rows) < 0.2
+    df.loc[shared, ID_COLUMN] = df[ID_COLUMN].to_numpy()[rng.integers(0, n_rows, size=int(shared.sum()))]
+    # Missing keys and IDs are left out, as with groupby / nunique
+    df.loc[rng.random(n_rows) < 0.01, "DIV_NAME"] = None
+    df.loc[rng.random(n_rows) < 0.01, ID_COLUMN] = None
+    return df
+
+
+def _final_summary_reference(df, by):
+    df = df.dropna(subset=KEYS)
+    created = df[ID_COLUMN].where(df["Is PSA Created"] == 1)
+    executed = df[ID_COLUMN].where(df["PSA Activity Executed"] == 1)
+    parts = pd.DataFrame({"all": df[ID_COLUMN], "created": created, "executed": executed})
+    if by:
+        counts = parts.groupby([df[key] for key in by], sort=True).nunique().reset_index()
+    else:
+        counts = parts.nunique().to_frame().T
+    return counts.rename(columns={"all": "HCP Selection Request", "created": "PSA Created",
+                                  "executed": "PSA Activity Executed"})
+
+
+def _assert_final_summary(result, df, by):
+    expected = _final_summary_reference(df, by)
+    assert len(result) == len(expected)
+    for key in by:
+        assert result[key].astype(str).tolist() == expected[key].astype(str).tolist()
+    for name in ["HCP Selection Request", "PSA Created", "PSA Activity Executed"]:
+        assert result[name].tolist() == expected[name].tolist(), name
+    ratio = np.round(expected["PSA Created"] / expected["HCP Selection Request"].replace(0, np.nan) * 100, 2)
+    assert np.allclose(result["PSA Created %"], ratio.fillna(0))
+
+
+def test_unique_counts_match_nunique():
+    df = _psa_frame()
+    _assert_final_summary(compute_metrics(df, KEYS, FINAL_SUMMARY_METRICS), df, KEYS)
+
+
+def test_rollup_levels_are_distinct_counts():
+    df = _psa_frame()
+    sets = [KEYS, ["Affiliate"], []]
+    results = rollup_metrics(df, KEYS, FINAL_SUMMARY_METRICS, sets)
+    for by, result in zip(sets, results):
+        _assert_final_summary(result, df, by)
+    # Shared IDs: the total is below the sum of the group counts
+    assert results[2]["HCP Selection Request"].iloc[0] < results[0]["HCP Selection Request"].sum()
+
+
+def test_additive_metrics_match_groupby():
+    df = _psa_frame()
+    keys = ["Tag", "Affiliate", "DIV_NAME", "Month"]
+    result = compute_metrics(df, keys, DASHBOARD_METRICS)
+    grouped = df.groupby(keys, sort=True)
+    assert result["HCP_Selection_Request_Count"].tolist() == grouped[ID_COLUMN].count().tolist()
+    assert result["PSA_Created_Count"].tolist() == grouped["Is PSA Created"].sum().tolist()
+    assert result["PSA_Activity_Executed_Count"].tolist() == grouped["PSA Activity Executed"].sum().tolist()
+
+
+def test_compact_frame_gives_the_same_results():
+    df = _psa_frame()
+    sets = [KEYS, []]
+    expected = rollup_metrics(df, KEYS, FINAL_SUMMARY_METRICS, sets)
+    compact = rollup_metrics(compact_psa_frame(df), KEYS, FINAL_SUMMARY_METRICS, sets)
+    for a, b in zip(compact, expected):
+        pd.testing.assert_frame_equal(a.astype({key: object for key in KEYS}),
+                                      b.astype({key: object for key in KEYS}))
+
+
+@pytest.mark.parametrize("chunk_rows", [7, 333, 1000])
+def test_merged_chunk_partials_match_one_pass(chunk_rows):
+    df = _psa_frame(2000)
+    sets = [KEYS, ["Affiliate"], []]
+    chunks = (df.iloc[start:start + chunk_rows] for start in range(0, len(df), chunk_rows))
+    merged, rows = summarize_chunks(chunks, KEYS, FINAL_SUMMARY_METRICS, sets)
+    assert rows == len(df)
+    for by, result in zip(sets, merged):
+        _assert_final_summary(result, df, by)
+
+
+@pytest.mark.parametrize("compact", [False, True])
+@pytest.mark.parametrize("workers", [1, 3])
+def test_parallel_matches_serial(workers, compact):
+    df = compact_psa_frame(_psa_frame()) if compact else _psa_frame()
+    sets = [KEYS, ["DIV_NAME"], []]
+    for metrics in (FINAL_SUMMARY_METRICS, DASHBOARD_METRICS):
+        expected = rollup_metrics(df, KEYS, metrics, sets)
+        result = parallel_rollup_metrics(df, KEYS, metrics, sets, workers=workers)
+        for a, b in zip(result, expected):
+            pd.testing.assert_frame_equal(a, b)
+    for by, result in zip(sets, parallel_rollup_metrics(df, KEYS, FINAL_SUMMARY_METRICS, sets, workers=workers)):
+        _assert_final_summary(result, df, by)
+
+
+def test_empty_input():
+    df = _psa_frame().iloc[:0]
+    group_summary, total = rollup_metrics(df, KEYS, FINAL_SUMMARY_METRICS, [KEYS, []])
+    assert group_summary.empty and total.empty
+    pair_groups, pair_ids, pair_flags = dedupe_pairs(np.zeros(0, np.int64), np.zeros(0, np.int64),
+                                                     np.zeros((0, 2), np.uint8))
+    assert len(pair_groups) == len(pair_ids) == len(pair_flags) == 0
+
+
+def _many_cell_frame(n_rows=20000):
+    keys = ["Tag", "Affiliate", "DIV_NAME", "Month", "Type Of Activity", "Requestor Territory"]
+    columns = keys + [ID_COLUMN, "Is PSA Created", "PSA Activity Executed"]
+    return generate_psa_frame(n_rows, seed=1, columns=columns, duplicate_rate=0.3), keys
+
+
+def test_approximate_counts_within_error():
+    df, keys = _many_cell_frame()
+    sets = [keys, ["Affiliate"], []]
+    exact = rollup_metrics(df, keys, FINAL_SUMMARY_METRICS, sets)
+    approximate = rollup_metrics(df, keys, FINAL_SUMMARY_METRICS, sets, approximate=0.02)
+    for a, b in zip(approximate, exact):
+        for name in ["HCP Selection Request", "PSA Created", "PSA Activity Executed"]:
+            # Within four standard errors, and exact for small cells (linear counting)
+            assert (np.abs(a[name] - b[name]) <= np.maximum(4 * a[name + " ±"], 1)).all(), name
+
+
+def test_sparse_and_dense_sketches_agree(monkeypatch):
+    df, keys = _many_cell_frame()
+    sets = [keys, ["Affiliate"], []]
+    sparse = rollup_metrics(df, keys, FINAL_SUMMARY_METRICS, sets, approximate=0.02)
+    # Every cell dense from its first register
+    monkeypatch.setattr(psa_hll, "DENSE_FRACTION", 1 << 30)
+    dense = rollup_metrics(df, keys, FINAL_SUMMARY_METRICS, sets, approximate=0.02)
+    for a, b in zip(sparse, dense):
+        pd.testing.assert_frame_equal(a, b)
+
+
+def test_approximate_memory_below_exact():
+    df, keys = _many_cell_frame()
+    plan = compile_metrics(FINAL_SUMMARY_METRICS)
+    peaks = []
+    for approximate in (None, 0.02):
+        tracemalloc.start()
+        state = fine_state(df, keys, plan, approximate)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    exact_bytes = sum(array.nbytes for _, _, pairs in fine_state(df, keys, plan)["unique"] for array in pairs)
+    sketch_bytes = sum(sketch.keys.nbytes + sketch.ranks.nbytes + sketch.dense.nbytes
+                       for sketch in state["sketches"].values())
+    # Many cells of a few dozen rows each, far fewer than the 4096 registers
+    assert len(df) / len(state["labels"]) < 50
+    assert sketch_bytes < exact_bytes
+    assert peaks[1] <= peaks[0]